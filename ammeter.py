@@ -0,0 +1,100 @@
+# ==============================================================================
+# GEN-CONTROL - PROFILS D'ENREGISTREUR AMPÈREMÉTRIQUE
+# Fichiers de pince enregistreuse (CSV ou binaire float32, 1 échantillon / période)
+# lus par blocs et intégrés avec la formule Willans, en mémoire bornée (depuis un chemin ;
+# dans l'application, le fichier téléversé est déjà en mémoire : voir .streamlit/config.toml).
+# ==============================================================================
+import heapq
+
+import numpy as np
+import pandas as pd
+
+import willans
+
+CHUNK_SAMPLES = 1_000_000       # échantillons traités par bloc
+HIST_BINS = np.linspace(0.0, 1.1, 23)  # classes de charge de 5%
+PEAK_WINDOW_S = 900             # fenêtre des pics (15 min)
+PEAK_COUNT = 5
+CHARGE_MAX = 1.1
+
+
+def csv_chunks(source, column=None, sep=",", chunk=CHUNK_SAMPLES):
+    """Courants (A) de la colonne `column` (dernière colonne par défaut) d'un CSV, bloc par bloc."""
+    reader = pd.read_csv(source, sep=sep, chunksize=chunk, usecols=None if column is None else [column])
+    for df in reader:
+        values = df[column] if column is not None else df.iloc[:, -1]
+        yield pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float32)
+
+
+def binary_chunks(source, dtype="<f4", chunk=CHUNK_SAMPLES):
+    """Courants d'un fichier binaire brut : chemin (np.memmap) ou tampon en mémoire (sans copie)."""
+    if isinstance(source, str):
+        data = np.memmap(source, dtype=dtype, mode="r")
+    else:
+        buf = memoryview(source)
+        data = np.frombuffer(buf, dtype=dtype, count=buf.nbytes // np.dtype(dtype).itemsize)
+    for start in range(0, len(data), chunk):
+        yield np.asarray(data[start:start + chunk], dtype=np.float32)
+
+
+def integrate(chunks, i_max, puissance_kw, period_s=1.0, csp=willans.CSP, friction=willans.FRICTION,
+              peak_window_s=PEAK_WINDOW_S, peaks=PEAK_COUNT):
+    """Intègre la conso théorique sur le profil réel de charge (courant / i_max).
+
+    Les échantillons invalides (NaN, négatifs) sont ignorés mais gardent leur place dans le
+    temps. Retourne un dict : heures, litres, charge_moy (charge équivalente), charge_max,
+    histogramme (heures par classe de HIST_BINS), pics (les `peaks` fenêtres de
+    `peak_window_s` les plus chargées : début en heures, charge moyenne) et fenetres
+    (charge moyenne de chaque fenêtre, NaN si elle n'a aucun échantillon valide).
+    """
+    window = max(1, int(round(peak_window_s / period_s)))
+    n = 0
+    total_fc = 0.0
+    max_fc = 0.0
+    hist = np.zeros(len(HIST_BINS) - 1)
+    means = []                    # une valeur par fenêtre complète
+    carry = np.empty(0, dtype=np.float32)
+    carry_ok = np.empty(0, dtype=bool)
+    for amps in chunks:
+        if not len(amps):
+            continue
+        # Masque plutôt que filtre : les fenêtres restent alignées sur l'index des échantillons
+        ok = np.isfinite(amps) & (amps >= 0)
+        fc = np.where(ok, np.minimum(amps / np.float32(i_max), CHARGE_MAX), 0).astype(np.float32)
+        valid = fc[ok]
+        if len(valid):
+            n += len(valid)
+            total_fc += float(valid.sum(dtype=np.float64))
+            max_fc = max(max_fc, float(valid.max()))
+            hist += np.histogram(valid, bins=HIST_BINS)[0]
+        # Moyennes par fenêtre ; le reste incomplet est reporté au bloc suivant
+        fc = np.concatenate([carry, fc])
+        ok = np.concatenate([carry_ok, ok])
+        full = len(fc) // window * window
+        if full:
+            means.extend(_window_means(fc[:full].reshape(-1, window), ok[:full].reshape(-1, window)))
+        carry, carry_ok = fc[full:], ok[full:]
+    if len(carry):
+        means.extend(_window_means(carry[None, :], carry_ok[None, :]))
+
+    heures = n * period_s / 3600
+    charge_moy = total_fc / n if n else 0.0
+    top = heapq.nlargest(peaks, (i for i, m in enumerate(means) if not np.isnan(m)), key=means.__getitem__)
+    return {
+        "echantillons": n,
+        "heures": heures,
+        # La conso horaire est affine en charge : intégrer = appliquer la charge moyenne
+        "litres": float(willans.conso_horaire(puissance_kw, charge_moy, csp, friction)) * heures,
+        "charge_moy": charge_moy,
+        "charge_max": max_fc,
+        "histogramme": hist * period_s / 3600,
+        "pics": [(i * window * period_s / 3600, means[i]) for i in sorted(top)],
+        "fenetres": means,
+    }
+
+
+def _window_means(fc, ok):
+    """Charge moyenne des échantillons valides de chaque ligne (NaN si aucun)."""
+    counts = ok.sum(axis=1)
+    sums = fc.sum(axis=1, dtype=np.float64)  # invalides déjà à 0
+    return np.divide(sums, counts, out=np.full(len(counts), np.nan), where=counts > 0).tolist()
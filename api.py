@@ -0,0 +1,269 @@
+# ==============================================================================
+# GEN-CONTROL - API D'INGESTION DES AUDITS (HTTP, ASYNCIO, SANS STREAMLIT)
+# Pour les boîtiers télématiques et le système de cartes carburant :
+#
+#   python api.py --port 8080 [--config .streamlit/secrets.toml]
+#
+#   POST /audits   Authorization: Bearer <code licence>
+#                  {"site": ..., "puissance_kw": ..., "facteur_charge": ..., "heures": ..., "litres": ...,
+#                   "prix": 828, "classe": "groupe"}  -- ou une liste / {"audits": [...]}
+#   GET  /health   état du service et du journal
+#
+# Même annuaire de licences, même verrou machine, même formule (willans.py) et même
+# journal (`logs`, action CALCUL) que gen_control.py.
+# ==============================================================================
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+
+import profiles
+import storage
+import tracing
+import willans
+from licenses import LicenseDirectory
+from log_writer import LogWriter
+
+MAX_BODY = 8 * 1024 * 1024
+MAX_BATCH = 10_000
+# Journal : lignes envoyées par gros lots (une requête Google = jusqu'à LOG_BATCH_SIZE lignes)
+LOG_BATCH_SIZE = 5000
+LOG_FLUSH_INTERVAL = 1.0
+LOG_MAX_QUEUE = 500_000
+VERDICT_LABELS = {willans.SURCONSO: "SURCONSO", willans.COHERENT: "COHERENT", willans.SOUSCONSO: "SOUS-CONSO"}
+STATUS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden", 404: "Not Found",
+          405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error",
+          503: "Service Unavailable"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class AuditAPI:
+    def __init__(self, store, licences, registry=None, log_writer=None):
+        self.store = store
+        self.licences = licences
+        self.registry = registry
+        self.log_writer = log_writer or LogWriter(lambda rows: store.append("logs", rows),
+                                                  batch_size=LOG_BATCH_SIZE, flush_interval=LOG_FLUSH_INTERVAL,
+                                                  max_queue=LOG_MAX_QUEUE)
+        self.counters = {"requests": 0, "audits": 0, "rejected": 0, "errors": 0}
+        self._locking = {}  # code -> verrouillage en cours (partagé par les requêtes simultanées)
+        self._started = time.time()
+
+    # --- Authentification / verrou machine ---
+    async def _authorize(self, code, sites):
+        """Vérifie la licence et le verrou ; retourne le site verrouillé."""
+        if not code:
+            raise HTTPError(401, "Code licence requis (Authorization: Bearer <code>)")
+        try:
+            # lookup peut interroger la version partagée de `users`, voire recharger la feuille :
+            # hors de la boucle, pour ne pas bloquer les autres connexions
+            entry = await asyncio.get_running_loop().run_in_executor(None, self.licences.lookup, code)
+        except Exception:
+            raise HTTPError(503, "Annuaire des licences injoignable")
+        if not entry or entry["statut"] != "ACTIF":
+            raise HTTPError(401, "Code invalide")
+        lock = entry["machine_lock"]
+        if not lock:
+            if len(sites) != 1 or None in sites:
+                raise HTTPError(403, "Licence non verrouillée : un seul `site` attendu pour le premier audit")
+            lock = await self._adopt_lock(code, next(iter(sites)))
+        bad = {s for s in sites if s is not None and s.upper() != lock.upper()}
+        if bad:
+            raise HTTPError(403, f"Licence liée à « {lock} »")
+        return lock
+
+    async def _adopt_lock(self, code, site):
+        """Premier audit d'une licence : une seule écriture du verrou, quel que soit le
+        nombre de requêtes simultanées (les suivantes attendent le même résultat)."""
+        task = self._locking.get(code)
+        if task is None:
+            loop = asyncio.get_running_loop()
+            task = self._locking[code] = loop.run_in_executor(
+                None, self.store.update_cell_if_empty, "users", "code_acces", code, "machine_lock", site)
+            task.add_done_callback(lambda _, code=code: self._locking.pop(code, None))
+        try:
+            lock = await asyncio.shield(task)
+        except Exception:
+            lock = None
+        if not lock:
+            raise HTTPError(503, "Verrouillage impossible")
+        self.licences.update(code, machine_lock=lock)
+        return lock
+
+    # --- Audit ---
+    def _columns(self, items):
+        try:
+            cols = {c: np.array([float(it[c]) for it in items]) for c in willans.COLONNES}
+            cols["prix"] = np.array([float(it.get("prix", willans.PRIX_DEFAUT)) for it in items])
+            csp, friction = [], []
+            for it in items:
+                classe = it.get("classe")
+                if classe is not None and (self.registry is None or classe not in self.registry.classes):
+                    raise HTTPError(400, f"Classe inconnue : {classe}")
+                ref = self.registry.classes[classe] if classe is not None else {}
+                csp.append(float(it.get("csp", ref.get("csp", willans.CSP))))
+                friction.append(float(ref.get("friction", willans.FRICTION)))
+            cols["csp"] = np.array(csp)
+            cols["friction"] = np.array(friction)
+        except (KeyError, TypeError, ValueError) as e:
+            raise HTTPError(400, f"Champs numériques requis : {', '.join(willans.COLONNES)} (+ prix, csp) ({e})")
+        bad = [c for c, v in cols.items() if not np.isfinite(v).all()]
+        if bad:
+            raise HTTPError(400, f"Valeurs non finies : {', '.join(bad)}")
+        return cols
+
+    async def audit(self, code, payload):
+        items = payload.get("audits") if isinstance(payload, dict) and "audits" in payload else payload
+        items = items if isinstance(items, list) else [items]
+        if not items or not all(isinstance(it, dict) for it in items):
+            raise HTTPError(400, "Audit(s) JSON attendu(s)")
+        if len(items) > MAX_BATCH:
+            raise HTTPError(413, f"Au plus {MAX_BATCH} audits par requête")
+        sites = {str(it["site"]).strip() if it.get("site") else None for it in items}
+        site = await self._authorize(code, sites)
+
+        with tracing.span("api.willans"):
+            c = self._columns(items)
+            res = willans.audit(c["puissance_kw"], c["facteur_charge"], c["heures"], c["litres"], c["prix"],
+                                csp=c["csp"], friction=c["friction"])
+        now = time.strftime("%Y-%m-%d %H:%M:%S")
+        results, rows = [], []
+        for theo, ecart, pct, perte, verdict in zip(res["theo"].tolist(), res["ecart"].tolist(), res["pct"].tolist(),
+                                                    res["perte"].tolist(), res["verdict"].tolist()):
+            results.append({"theo": round(theo, 3), "ecart": round(ecart, 3), "pct": round(pct, 2),
+                            "perte": round(perte), "verdict": VERDICT_LABELS[verdict]})
+            rows.append([now, code, "CALCUL", f"{pct:.1f}% | {perte:.0f}F"])
+        # Journal seulement une fois la réponse construite (un échec ne laisse pas de ligne orpheline).
+        # File mémoire : submit ne bloque pas, le thread d'écriture envoie par lots
+        for row in rows:
+            self.log_writer.submit(row)
+        self.counters["audits"] += len(results)
+        return {"site": site, "results": results}
+
+    def health(self):
+        return {"uptime_s": round(time.time() - self._started), **self.counters,
+                "log": self.log_writer.stats(), "licences": self.licences.stats}
+
+    # --- HTTP ---
+    async def route(self, method, path, headers, body):
+        if path == "/health":
+            return 200, self.health()
+        if path != "/audits":
+            raise HTTPError(404, "Inconnu")
+        if method != "POST":
+            raise HTTPError(405, "POST attendu")
+        try:
+            payload = json.loads(body or b"null")
+        except ValueError:
+            raise HTTPError(400, "JSON invalide")
+        auth = headers.get("authorization", "")
+        code = auth[7:].strip() if auth.lower().startswith("bearer ") else None
+        with tracing.span("api.audits"):
+            return 200, await self.audit(code, payload)
+
+    async def handle(self, reader, writer):
+        """Une connexion HTTP/1.1 (keep-alive) : requêtes traitées l'une après l'autre."""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    method, target, version = line.decode("latin-1").split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    h = await reader.readline()
+                    if h in (b"\r\n", b"\n", b""):
+                        break
+                    k, _, v = h.decode("latin-1").partition(":")
+                    headers[k.strip().lower()] = v.strip()
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                self.counters["requests"] += 1
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    # Corps de longueur inconnue : impossible de retrouver la requête suivante
+                    self.counters["rejected"] += 1
+                    status, payload, keep_alive = 400, {"error": "Content-Length invalide"}, False
+                elif length > MAX_BODY:
+                    status, payload, keep_alive = 413, {"error": "Corps trop volumineux"}, False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    try:
+                        status, payload = await self.route(method, target.split("?")[0], headers, body)
+                    except HTTPError as e:
+                        self.counters["rejected"] += 1
+                        status, payload = e.status, {"error": str(e)}
+                    except Exception:
+                        # Jamais de connexion sans réponse
+                        self.counters["errors"] += 1
+                        status, payload = 500, {"error": "Erreur interne"}
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                writer.write(f"HTTP/1.1 {status} {STATUS.get(status, '')}\r\nContent-Type: application/json\r\n"
+                             f"Content-Length: {len(data)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}"
+                             f"\r\n\r\n".encode("latin-1") + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(api, host="0.0.0.0", port=8080, ready=None):
+    server = await asyncio.start_server(api.handle, host, port, backlog=1024)
+    if ready is not None:
+        ready()
+    async with server:
+        await server.serve_forever()
+
+
+def build(config, conn_factory):
+    """Stockage, annuaire et API à partir des sections [storage] / [tracing] des secrets."""
+    tracing.configure(**config.get("tracing", {}))
+    store = storage.from_config(config.get("storage", {}), conn_factory)
+    licences = LicenseDirectory(lambda: store.read("users"), ttl=60, version_fn=lambda: store.version("users"))
+    licences.reload()
+    return AuditAPI(store, licences, profiles.load())
+
+
+def main():
+    import tomllib
+
+    parser = argparse.ArgumentParser(description="API HTTP d'ingestion des audits GEN-CONTROL")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--config", default=".streamlit/secrets.toml", help="secrets Streamlit ([storage], [connections.gsheets])")
+    args = parser.parse_args()
+    with open(args.config, "rb") as f:
+        config = tomllib.load(f)
+
+    def conn_factory():
+        import streamlit as st
+        from streamlit_gsheets import GSheetsConnection
+        return st.connection("gsheets", type=GSheetsConnection)
+
+    api = build(config, conn_factory)
+    print(f"GEN-CONTROL API sur http://{args.host}:{args.port}")
+    try:
+        asyncio.run(serve(api, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        api.log_writer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@
 # GEN-CONTROL V1.1.2 - FINAL (Patch Streamlit 2026 - CORRIGÉ LOGOUT)
 # ==============================================================================
 import streamlit as st
+import importlib
 import os
 import time
 from datetime import datetime
@@ -9,12 +10,27 @@ import uuid
 import urllib.parse
 
 # Assurez-vous que ces fichiers existent bien dans votre dossier
+# (physics, analytics, reports, payments : importés à la première utilisation, voir _Lazy)
 from database import ThreadSafeDatabase
 from security import EnhancedSecurityManager
-from physics import IsoWillansModel, ReferenceEngineLibrary, AtmosphericParams
-from analytics import DetailedLoadFactorManager, IntelligentAnomalyDetector, AdaptiveLearningEngine
-from reports import PDFReportGenerator
-from payments import render_payment_page
+import tracing
+
+class _Lazy:
+    """Objet obtenu par `load()` au premier appel ou accès d'attribut : les pages qui ne
+    s'en servent pas (connexion) n'importent ni physics, ni analytics, ni reports."""
+    def __init__(self, load): self._load = load
+    def __call__(self, *args, **kwargs): return self._load()(*args, **kwargs)
+    def __getattr__(self, attr): return getattr(self._load(), attr)
+
+def _lazy_import(module, name): return _Lazy(lambda: getattr(importlib.import_module(module), name))
+
+IsoWillansModel = _lazy_import("physics", "IsoWillansModel")
+ReferenceEngineLibrary = _lazy_import("physics", "ReferenceEngineLibrary")
+AtmosphericParams = _lazy_import("physics", "AtmosphericParams")
+DetailedLoadFactorManager = _lazy_import("analytics", "DetailedLoadFactorManager")
+IntelligentAnomalyDetector = _lazy_import("analytics", "IntelligentAnomalyDetector")
+AdaptiveLearningEngine = _lazy_import("analytics", "AdaptiveLearningEngine")
+PDFReportGenerator = _lazy_import("reports", "PDFReportGenerator")
 
 st.set_page_config(page_title="GEN-CONTROL V1.1", page_icon="🛡️", layout="wide", initial_sidebar_state="expanded")
 
@@ -32,15 +48,84 @@ st.markdown("""
 @st.cache_resource
 def get_db(): return ThreadSafeDatabase.get_instance()
 
+# --- CACHES PARTAGÉS (catalogue engins, configuration) ---
+CONFIG_DEFAULTS = {"AGING_FACTOR": "1.05"}
+
+# Une seule version pour tout le processus : la table `equipment` est lue en entier
+@st.cache_resource
+def _catalog_version(): return {'n': 0}
+
+def invalidate_catalog():
+    """À appeler après toute écriture dans `equipment` (page Calibration)."""
+    _catalog_version()['n'] += 1
+
+# cache_resource : index partagé en lecture seule, sans désérialisation à chaque rerun
+@st.cache_resource(ttl=600, show_spinner=False)
+def _load_catalog(version):
+    rows = get_db().execute_read("SELECT equipment_id, equipment_name, profile_base, power_kw FROM equipment")
+    return {e['equipment_id']: dict(e) for e in rows}
+
+def get_catalog():
+    """Engins indexés par equipment_id (ne pas modifier), relus après invalidate_catalog (ou 10 min)."""
+    return _load_catalog(_catalog_version()['n'])
+
+@st.cache_data(ttl=300, show_spinner=False)
+def get_config_snapshot():
+    db = get_db(); snap = {}
+    for key, default in CONFIG_DEFAULTS.items():
+        try: snap[key] = db.get_config_value(key, default)
+        except: snap[key] = default
+    return snap
+
+@st.cache_resource
+def ensure_audit_index():
+    # Dernier index d'un engin = une descente d'index (equipment_id, timestamp) au lieu d'un tri
+    try: get_db().execute_write("CREATE INDEX IF NOT EXISTS idx_audits_equipment_ts ON audits(equipment_id, timestamp DESC)")
+    except: pass
+    return True
+
+# Moteurs sans état propre à l'utilisateur : une instance par processus
+@st.cache_resource
+def get_detector(): return IntelligentAnomalyDetector()
+
+@st.cache_resource
+def get_engine_library(): return ReferenceEngineLibrary()
+
+@st.cache_resource
+def get_pdf_generator(): return PDFReportGenerator()
+
+# Instrumentation : section [tracing] des secrets (sample_rate, sink), voir tracing.py
+@st.cache_resource
+def init_tracing():
+    try: tracing.configure(**st.secrets.get("tracing", {}))
+    except: pass
+    return True
+
 def init_session():
+    init_tracing()
     if 'db' not in st.session_state: st.session_state.db = get_db()
     if 'security' not in st.session_state: st.session_state.security = EnhancedSecurityManager(st.session_state.db)
-    if 'analytics' not in st.session_state: 
-        st.session_state.detector = IntelligentAnomalyDetector()
-        st.session_state.learning = AdaptiveLearningEngine()
-        st.session_state.pdf_gen = PDFReportGenerator()
+    # Générateur PDF partagé, importé au premier rapport
+    if 'pdf_gen' not in st.session_state: st.session_state.pdf_gen = _Lazy(get_pdf_generator)
+
+def init_intelligence():
+    """Pages Audit / Intelligence : moteurs partagés, apprentissage propre à la session."""
+    if 'detector' not in st.session_state: st.session_state.detector = get_detector()
+    if 'engines' not in st.session_state: st.session_state.engines = get_engine_library()
+    if 'learning' not in st.session_state: st.session_state.learning = AdaptiveLearningEngine()
+
+def render_monitoring():
+    """En tête de la page Admin : temps par span (fonctions @tracing.traced, stockage...)."""
+    with st.expander("📊 Monitoring (spans)", expanded=False):
+        st.dataframe(tracing.snapshot(), use_container_width=True, hide_index=True)
+        if st.button("Remettre à zéro", key="tracing_reset"): tracing.reset(); st.rerun()
+
+def render_payment_page(*args, **kwargs):
+    from payments import render_payment_page as render
+    return render(*args, **kwargs)
 
 # --- CORRECTION MAJEURE ICI (NAVIGATION SECURISEE) ---
+@tracing.traced("app.render_sidebar")
 def render_sidebar():
     # 1. SÉCURITÉ : Si l'utilisateur n'est pas connecté, ON ARRÊTE TOUT.
     # Cela empêche la sidebar de s'afficher une fois déconnecté.
@@ -63,6 +148,7 @@ def render_sidebar():
         if st.session_state.get('role') == 'admin': opts.append("🔐 Admin")
         
         menu = st.radio("Navigation", opts)
+        if menu == "🧠 Intelligence": init_intelligence()
         
         st.markdown("---")
         
@@ -77,9 +163,12 @@ def render_sidebar():
         st.markdown("---")
         st.warning("⚠️ **AVIS JURIDIQUE**")
         st.markdown("<div style='font-size:0.7em; text-align:justify;'>Outil d'aide à la décision technique (ISO 15550). Résultats non contractuels.</div>", unsafe_allow_html=True)
-        
-        return menu
 
+    # Page Admin (rôle admin uniquement, voir opts) : monitoring affiché dans la page
+    if menu == "🔐 Admin" and st.session_state.get('role') == 'admin': render_monitoring()
+    return menu
+
+@tracing.traced("app.render_auth")
 def render_auth():
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
@@ -119,19 +208,21 @@ def render_auth():
                         if ok: st.success("Créé !"); time.sleep(1); st.rerun()
                         else: st.error(f"Erreur: {msg}")
 
+@tracing.traced("app.render_audit_page")
 def render_audit_page():
+    init_intelligence()
     tier = st.session_state.get('license_tier', 'DISCOVERY')
     st.markdown(f'<div class="main-header">📱 Audit Terrain <span style="font-size:0.6em; color:grey">({tier})</span></div>', unsafe_allow_html=True)
     db = st.session_state.db
+    ensure_audit_index()
     
-    try: aging_val = float(db.get_config_value("AGING_FACTOR", "1.05"))
+    try: aging_val = float(get_config_snapshot()["AGING_FACTOR"])
     except: aging_val = 1.05
 
     try:
-        equipments = db.execute_read("SELECT equipment_id, equipment_name, profile_base, power_kw FROM equipment")
-        if not equipments: st.warning("⚠️ Aucun équipement. Allez dans 'Calibration'."); return
-        eq_options = {e['equipment_id']: f"{e['equipment_name']} ({e['profile_base']})" for e in equipments}
-        selected_id = st.selectbox("Sélectionner l'engin", list(eq_options.keys()), format_func=lambda x: eq_options[x])
-        eq_data = next(e for e in equipments if e['equipment_id'] == selected_id)
+        catalog = get_catalog()
+        if not catalog: st.warning("⚠️ Aucun équipement. Allez dans 'Calibration'."); return
+        selected_id = st.selectbox("Sélectionner l'engin", list(catalog), format_func=lambda x: f"{catalog[x]['equipment_name']} ({catalog[x]['profile_base']})")
+        eq_data = catalog[selected_id]
         last_audit = db.execute_read("SELECT index_end FROM audits WHERE equipment_id = ? ORDER BY timestamp DESC LIMIT 1", (selected_id,))
         suggested_start = float(last_audit[0]['index_end']) if last_audit else 0.
\ No newline at end of file
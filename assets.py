@@ -0,0 +1,43 @@
+# ==============================================================================
+# LIVRE D'OR - RESSOURCES STATIQUES (QR CODE LOCAL, LOGO REDIMENSIONNÉ)
+# Produites une seule fois puis servies en octets depuis la mémoire.
+# ==============================================================================
+import io
+
+from PIL import Image
+
+try:
+    import qrcode
+except ImportError:  # Repli : QR code via l'API publique (comportement historique)
+    qrcode = None
+
+
+def qr_png(data, size=200):
+    """QR code de `data` en PNG (octets), ou None si la librairie `qrcode` est absente."""
+    if qrcode is None:
+        return None
+    qr = qrcode.QRCode(border=2, error_correction=qrcode.constants.ERROR_CORRECT_M)
+    qr.add_data(data)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="black", back_color="white").get_image().convert("L")
+    img = img.resize((size, size), Image.NEAREST)
+    buf = io.BytesIO()
+    img.save(buf, format="PNG", optimize=True)
+    return buf.getvalue()
+
+
+def qr_url(data, size=200):
+    return f"https://api.qrserver.com/v1/create-qr-code/?size={size}x{size}&data={data}"
+
+
+def resized_image(path, width, quality=80):
+    """Image `path` réduite à `width` pixels de large, en JPEG (octets).
+    Si elle est déjà assez petite, le fichier d'origine est servi tel quel."""
+    with Image.open(path) as img:
+        if img.width <= width:
+            with open(path, "rb") as f:
+                return f.read()
+        img = img.convert("RGB").resize((width, round(img.height * width / img.width)), Image.LANCZOS)
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=quality, optimize=True)
+        return buf.getvalue()
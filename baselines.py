@@ -0,0 +1,104 @@
+# ==============================================================================
+# GEN-CONTROL - RÉFÉRENCES DE CONSOMMATION PAR MATÉRIEL
+# Par matériel (code licence + machine_lock) : moyenne / variance glissantes de l'écart (Welford),
+# moyenne exponentielle, nombre d'audits et les N derniers écarts.
+# Une ligne SQLite par matériel, mise à jour en O(1) à chaque audit.
+# ==============================================================================
+import array
+import math
+import sqlite3
+import threading
+
+FENETRE = 20        # derniers écarts conservés
+ALPHA = 0.2         # poids du dernier audit dans la moyenne exponentielle
+MIN_AUDITS = 5      # historique minimal avant de juger un écart
+Z_SEUIL = 3.0       # écart "anormal" au-delà de Z_SEUIL écarts-types
+STD_MIN = 1.0       # plancher de l'écart-type (points de %) : historique trop régulier
+
+
+class Baseline:
+    __slots__ = ("n", "mean", "m2", "ewma", "recent")
+
+    def __init__(self, n=0, mean=0.0, m2=0.0, ewma=None, recent=()):
+        self.n = n
+        self.mean = mean
+        self.m2 = m2
+        self.ewma = ewma
+        self.recent = list(recent)
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else 0.0
+
+    def zscore(self, x, std_min=STD_MIN):
+        # Plancher : des écarts passés tous identiques (std nulle) n'empêchent pas de juger
+        return (x - self.mean) / max(self.std, std_min)
+
+    def update(self, x, alpha=ALPHA, fenetre=FENETRE):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+        self.ewma = x if self.ewma is None else alpha * x + (1 - alpha) * self.ewma
+        self.recent = (self.recent + [x])[-fenetre:]
+
+
+def _pack(values):
+    return array.array("f", values).tobytes()
+
+
+def _unpack(blob):
+    a = array.array("f")
+    a.frombytes(blob or b"")
+    return a.tolist()
+
+
+class BaselineStore:
+    """Références persistées dans `path` ; lecture-modification-écriture dans une transaction
+    SQLite, donc cohérent entre sessions et entre processus."""
+
+    def __init__(self, path, alpha=ALPHA, fenetre=FENETRE, min_audits=MIN_AUDITS, z_seuil=Z_SEUIL):
+        self.alpha = alpha
+        self.fenetre = fenetre
+        self.min_audits = min_audits
+        self.z_seuil = z_seuil
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS baselines (site TEXT PRIMARY KEY, n INTEGER, mean REAL, "
+                         "m2 REAL, ewma REAL, recent BLOB)")
+
+    @staticmethod
+    def _key(code, site):
+        # Deux licences peuvent verrouiller des matériels de même nom ("GROUPE 1")
+        return f"{str(code).strip()}|{str(site).strip().upper()}"
+
+    def _load(self, site):
+        row = self._db.execute("SELECT n, mean, m2, ewma, recent FROM baselines WHERE site = ?", (site,)).fetchone()
+        return Baseline(*row[:4], _unpack(row[4])) if row else Baseline()
+
+    def get(self, code, site):
+        with self._lock:
+            return self._load(self._key(code, site))
+
+    def update(self, code, site, ecart_pct):
+        """Juge `ecart_pct` contre l'historique du matériel `site` de la licence `code`, puis l'y ajoute.
+
+        Retourne un dict : n, mean, std, ewma (avant cet audit), z, anormal, recent (après)."""
+        key = self._key(code, site)
+        with self._lock:
+            with self._db:
+                self._db.execute("BEGIN IMMEDIATE")
+                b = self._load(key)
+                z = b.zscore(ecart_pct)
+                verdict = {"n": b.n, "mean": b.mean, "std": b.std, "ewma": b.ewma, "z": z,
+                           "anormal": b.n >= self.min_audits and abs(z) > self.z_seuil}
+                b.update(ecart_pct, self.alpha, self.fenetre)
+                self._db.execute("INSERT OR REPLACE INTO baselines VALUES (?, ?, ?, ?, ?, ?)",
+                                 (key, b.n, b.mean, b.m2, b.ewma, _pack(b.recent)))
+        verdict["recent"] = b.recent
+        return verdict
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,264 @@
+# ==============================================================================
+# FAUX BACKEND GOOGLE SHEETS (EN MÉMOIRE) POUR BENCHMARKS ET TESTS DE CHARGE
+# Imite GSheetsConnection (read / update) et les Worksheet gspread utilisées
+# par sheets.py, avec latence injectée et comptage des appels / octets.
+# ==============================================================================
+import collections
+import random
+import re
+import threading
+import time
+from multiprocessing.managers import BaseManager
+
+import pandas as pd
+
+def make_tables(users=1000, logs=1000, guestbook=1000, seed=0):
+    """Feuilles synthétiques de tailles données."""
+    rnd = random.Random(seed)
+    return {
+        "users": pd.DataFrame({
+            "code_acces": [f"GEN-{i:06d}" for i in range(users)],
+            "client_nom": [f"Client {i}" for i in range(users)],
+            "statut": ["ACTIF" if i % 10 else "SUSPENDU" for i in range(users)],
+            "machine_lock": [f"Site {i}" if i % 2 else "" for i in range(users)],
+            "date_creation": ["2025-01-01"] * users,
+        }),
+        "logs": pd.DataFrame({
+            "date_heure": [f"2025-06-{1 + i % 28:02d} 10:00:00" for i in range(logs)],
+            "code_utilise": [f"GEN-{rnd.randrange(max(users, 1)):06d}" for _ in range(logs)],
+            "action": [rnd.choice(["LOGIN", "CALCUL"]) for _ in range(logs)],
+            "details": [f"{rnd.uniform(-30, 60):.1f}% | {rnd.randint(-5000, 90000)}F" for _ in range(logs)],
+        }),
+        "guestbook": pd.DataFrame({
+            "date": ["10:00"] * guestbook,
+            "nom": [f"Invité {i}" for i in range(guestbook)],
+            "promo": [str(2000 + i % 25) for i in range(guestbook)],
+            "entreprise": [f"Entreprise {i % 50}" for i in range(guestbook)],
+            "message": ["Félicitations aux filleuls, bon courage pour la suite !"] * guestbook,
+        }),
+    }
+
+
+class RateLimitError(Exception):
+    """Équivalent de l'APIError gspread en HTTP 429."""
+
+    class response:
+        status_code = 429
+
+
+class _Cell:
+    def __init__(self, value):
+        self.value = value
+
+
+def _txt(v):
+    return "" if v is None or (isinstance(v, float) and pd.isna(v)) else str(v)
+
+
+class FakeWorksheet:
+    def __init__(self, backend, name):
+        self.backend = backend
+        self.name = name
+
+    @property
+    def _df(self):
+        return self.backend.tables[self.name]
+
+    def row_values(self, row):
+        with self.backend.call("row_values", self.name) as rec:
+            df = self._df
+            out = list(df.columns) if row == 1 else [_txt(v) for v in df.iloc[row - 2]]
+            rec(out)
+            return out
+
+    def col_values(self, col):
+        with self.backend.call("col_values", self.name) as rec:
+            df = self._df
+            out = [df.columns[col - 1]] + [_txt(v) for v in df.iloc[:, col - 1]]
+            rec(out)
+            return out
+
+    def get_values(self, rng):
+        with self.backend.call("get_values", self.name) as rec:
+            start = int(re.match(r"[A-Z]+(\d+)", rng).group(1))
+            out = [[_txt(v) for v in r] for r in self._df.iloc[max(start - 2, 0):].itertuples(index=False)]
+            rec(out)
+            return out
+
+    def cell(self, row, col):
+        with self.backend.call("cell", self.name) as rec:
+            v = _txt(self._df.iat[row - 2, col - 1])
+            rec(v)
+            return _Cell(v or None)
+
+    def update_cell(self, row, col, value):
+        with self.backend.call("update_cell", self.name, write=True) as rec:
+            rec(value)
+            self._df.iat[row - 2, col - 1] = value
+
+    def batch_update(self, data, **kwargs):
+        with self.backend.call("batch_update", self.name, write=True) as rec:
+            rec(data)
+            for d in data:
+                m = re.match(r"([A-Z]+)(\d+)", d["range"])
+                col = sum((ord(ch) - 64) * 26 ** i for i, ch in enumerate(reversed(m.group(1))))
+                self._df.iat[int(m.group(2)) - 2, col - 1] = d["values"][0][0]
+
+    def append_rows(self, rows, **kwargs):
+        with self.backend.call("append_rows", self.name, write=True) as rec:
+            rec(rows)
+            df = self._df
+            rows = [list(r) + [""] * (len(df.columns) - len(r)) for r in rows]
+            self.backend.tables[self.name] = pd.concat([df, pd.DataFrame(rows, columns=df.columns)], ignore_index=True)
+
+
+class _FakeClient:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def _select_worksheet(self, worksheet=None, **kwargs):
+        return FakeWorksheet(self.backend, worksheet)
+
+
+class FakeGSheetsConnection:
+    """Remplace `st.connection("gsheets", type=GSheetsConnection)`.
+
+    `latency_ms` est ajoutée à chaque appel ; `write_quota` / `read_quota` (requêtes par
+    minute) simulent les quotas Google et lèvent RateLimitError au-delà.
+    """
+
+    def __init__(self, tables=None, latency_ms=0.0, write_quota=None, read_quota=None):
+        self.tables = tables if tables is not None else make_tables()
+        self.latency = latency_ms / 1000.0
+        self.write_quota = write_quota
+        self.read_quota = read_quota
+        self.client = _FakeClient(self)
+        self._lock = threading.RLock()
+        self._quota_lock = threading.Lock()
+        self._writes = collections.deque()
+        self._reads = collections.deque()
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.calls = collections.Counter()
+        self.bytes = collections.Counter()
+        self.errors = collections.Counter()
+
+    def call(self, op, worksheet, write=False):
+        backend = self
+
+        class _Call:
+            def __enter__(self):
+                time.sleep(backend.latency)
+                backend._check_quota(op, write)
+                backend._lock.acquire()
+                backend.calls[op] += 1
+                return self.record
+
+            def record(self, payload):
+                backend.bytes[op] += len(repr(payload))
+
+            def __exit__(self, *exc):
+                backend._lock.release()
+                return False
+
+        return _Call()
+
+    def _check_quota(self, op, write):
+        quota, window = (self.write_quota, self._writes) if write else (self.read_quota, self._reads)
+        if quota is None:
+            return
+        with self._quota_lock:
+            now = time.monotonic()
+            while window and window[0] < now - 60:
+                window.popleft()
+            if len(window) >= quota:
+                self.errors[op] += 1
+                raise RateLimitError("429 Quota exceeded (fake)")
+            window.append(now)
+
+    # --- API GSheetsConnection ---
+    def read(self, worksheet=None, ttl=None, usecols=None, **kwargs):
+        with self.call("read", worksheet):
+            df = self.tables[worksheet].copy()
+            # Estimation du volume transféré sans sérialiser toute la feuille
+            self.bytes["read"] += len(df) * (len(repr(df.iloc[0].tolist())) if len(df) else 0)
+            return df.iloc[:, usecols] if usecols else df
+
+    def update(self, worksheet=None, data=None, **kwargs):
+        with self.call("update", worksheet, write=True):
+            self.bytes["update"] += len(data) * (len(repr(data.iloc[0].tolist())) if len(data) else 0)
+            self.tables[worksheet] = data.copy()
+
+    # --- Accès depuis d'autres processus (voir RemoteGSheetsConnection) ---
+    def worksheet_call(self, worksheet, method, args=(), kwargs=None):
+        return getattr(FakeWorksheet(self, worksheet), method)(*args, **(kwargs or {}))
+
+    def table(self, worksheet):
+        with self._lock:
+            return self.tables[worksheet].copy()
+
+    def counters(self):
+        return {"calls": dict(self.calls), "bytes": dict(self.bytes), "errors": dict(self.errors)}
+
+
+# ------------------------------------------------------------------------------
+# BACKEND PARTAGÉ ENTRE PROCESSUS
+# Un seul faux Google Sheets dans le processus du gestionnaire ; chaque processus
+# Streamlit simulé s'y connecte (mêmes feuilles, mêmes quotas, mêmes courses).
+# ------------------------------------------------------------------------------
+_shared = None
+
+
+def _init_shared(tables, options):
+    global _shared
+    _shared = FakeGSheetsConnection(make_tables(**tables), **options)
+
+
+def _get_shared():
+    return _shared
+
+
+class FakeBackendManager(BaseManager):
+    pass
+
+
+FakeBackendManager.register("backend", callable=_get_shared)
+
+
+def start_shared_backend(tables, **options):
+    """Démarre le gestionnaire ; `tables` : arguments de make_tables, `options` : latency_ms, quotas."""
+    manager = FakeBackendManager()
+    manager.start(initializer=_init_shared, initargs=(tables, options))
+    return manager
+
+
+class _RemoteWorksheet:
+    def __init__(self, backend, name):
+        self._backend = backend
+        self._name = name
+
+    def __getattr__(self, method):
+        return lambda *args, **kwargs: self._backend.worksheet_call(self._name, method, args, kwargs)
+
+
+class _RemoteClient:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def _select_worksheet(self, worksheet=None, **kwargs):
+        return _RemoteWorksheet(self.backend, worksheet)
+
+
+class RemoteGSheetsConnection:
+    """Même interface que FakeGSheetsConnection, servie par le backend partagé `backend` (proxy)."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.client = _RemoteClient(backend)
+
+    def read(self, worksheet=None, ttl=None, usecols=None, **kwargs):
+        return self.backend.read(worksheet, ttl, usecols)
+
+    def update(self, worksheet=None, data=None, **kwargs):
+        return self.backend.update(worksheet, data)
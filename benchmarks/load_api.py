@@ -0,0 +1,128 @@
+# ==============================================================================
+# TEST DE CHARGE DE api.py
+# Lance l'API dans un processus séparé contre le faux Google Sheets (fake_gsheets.py),
+# puis N connexions keep-alive envoient des lots d'audits pendant D secondes.
+#
+#   python benchmarks/load_api.py --connections 64 --batch 50 --duration 10
+#   python benchmarks/load_api.py --url http://127.0.0.1:8080 --code GEN-XXXX   (API déjà lancée)
+# ==============================================================================
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import time
+import urllib.parse
+import urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+
+def _server(port, users, latency_ms, ready):
+    import api
+    from fake_gsheets import FakeGSheetsConnection, make_tables
+
+    fake = FakeGSheetsConnection(make_tables(users=users, logs=0, guestbook=0), latency_ms=latency_ms)
+    asyncio.run(api.serve(api.build({}, lambda: fake), "127.0.0.1", port, ready=ready.set))
+
+
+def _payload(site, batch, rnd):
+    return json.dumps({"audits": [{
+        "site": site, "classe": "groupe", "puissance_kw": rnd.choice([40, 80, 160, 400]),
+        "facteur_charge": round(rnd.uniform(0.2, 0.9), 2), "heures": rnd.choice([4, 8, 12, 24]),
+        "litres": round(rnd.uniform(10, 900), 1),
+    } for _ in range(batch)]}).encode()
+
+
+async def _client(host, port, code, site, batch, deadline, latencies, errors, seed):
+    rnd = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            body = _payload(site, batch, rnd)
+            t0 = time.perf_counter()
+            writer.write(f"POST /audits HTTP/1.1\r\nHost: {host}\r\nAuthorization: Bearer {code}\r\n"
+                         f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+            await writer.drain()
+            status = int((await reader.readline()).split()[1])
+            length = 0
+            while True:
+                h = await reader.readline()
+                if h in (b"\r\n", b""):
+                    break
+                if h.lower().startswith(b"content-length:"):
+                    length = int(h.split(b":")[1])
+            await reader.readexactly(length)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            if status != 200:
+                errors[status] = errors.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+async def _load(host, port, code, site, connections, batch, duration):
+    latencies, errors = [], {}
+    deadline = time.perf_counter() + duration
+    t0 = time.perf_counter()
+    await asyncio.gather(*(_client(host, port, code, site, batch, deadline, latencies, errors, i)
+                           for i in range(connections)))
+    return latencies, errors, time.perf_counter() - t0
+
+
+def _get(url):
+    with urllib.request.urlopen(url, timeout=10) as r:
+        return json.load(r)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge de l'API d'ingestion")
+    parser.add_argument("--url", help="API déjà lancée (sinon : serveur local contre le faux backend)")
+    parser.add_argument("--code", default="GEN-000002", help="code licence ACTIF")
+    parser.add_argument("--site", default="Site 1")
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--batch", type=int, default=50, help="audits par requête")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--users", type=int, default=1000, help="taille de la feuille users simulée")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="latence simulée du backend")
+    args = parser.parse_args()
+
+    proc = None
+    if args.url:
+        url = args.url.rstrip("/")
+    else:
+        ready = multiprocessing.Event()
+        proc = multiprocessing.Process(target=_server, args=(args.port, args.users, args.latency_ms, ready), daemon=True)
+        proc.start()
+        if not ready.wait(60):
+            sys.exit("Le serveur n'a pas démarré")
+        url = f"http://127.0.0.1:{args.port}"
+    parsed = urllib.parse.urlparse(url)
+
+    try:
+        latencies, errors, elapsed = asyncio.run(_load(parsed.hostname, parsed.port or 80, args.code, args.site,
+                                                       args.connections, args.batch, args.duration))
+        time.sleep(2.0)  # laisse le journal se vider avant le bilan
+        health = _get(f"{url}/health")
+    finally:
+        if proc is not None:
+            proc.terminate()
+
+    ok = len(latencies) - sum(errors.values())
+    q = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0.0] * 99
+    log = health.get("log", {})
+    print(f"requêtes      : {len(latencies):,} en {elapsed:.1f}s ({len(latencies) / elapsed:,.0f}/s), erreurs {errors or 0}")
+    print(f"audits        : {ok * args.batch:,} ({ok * args.batch / elapsed:,.0f}/s)")
+    print(f"latence (ms)  : p50 {q[49]:.1f}  p99 {q[98]:.1f}  max {max(latencies, default=0):.1f}")
+    print(f"journal       : soumis {log.get('submitted', 0):,}  écrits {log.get('written', 0):,}  "
+          f"en file {log.get('queue_depth', 0):,}  perdus {log.get('dropped', 0) + log.get('lost', 0):,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+# ==============================================================================
+# TEST DE CHARGE : N SESSIONS STREAMLIT SIMULTANÉES (AppTest) + LIGNES PERDUES
+# Techniciens sur gen_control.py (connexion, verrou machine, audits) et invités sur
+# guestbook.py (signature, actualisations). Chaque processus joue un serveur Streamlit
+# (AppTest n'est pas utilisable depuis plusieurs threads) ; tous partagent le même faux
+# Google Sheets (latence et quotas réglables). Bilan : débit, p50/p99 par interaction,
+# appels API, erreurs 429, lignes `logs` / `guestbook` perdues ou dupliquées, verrous.
+#
+#   python benchmarks/load_sessions.py --technicians 10 --guests 20 --latency-ms 50
+#   python benchmarks/load_sessions.py --technicians 20 --write-quota 60 --out charge.json
+#   python benchmarks/load_sessions.py --guests 40 --sessions-per-process 10   (4 serveurs)
+# ==============================================================================
+import argparse
+import collections
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+import streamlit as st  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from fake_gsheets import FakeBackendManager, RemoteGSheetsConnection, start_shared_backend  # noqa: E402
+from run import _button, _widget  # noqa: E402
+
+POLL_S = 0.5
+
+
+# --- Parcours : [(interaction, action, ligne attendue (feuille, clé) ou None)] ---
+def technician_steps(code, site, audits):
+    def login(at):
+        _widget(at.text_input, "CODE LICENCE").input(code)
+        _button(at, "DÉVERROUILLER").click().run()
+
+    def audit(at):
+        field = _widget(at.text_input, "MATÉRIEL")
+        if not field.disabled:
+            field.input(site).run()
+        _button(at, "LANCER L'AUDIT").click().run()
+
+    # LOGIN puis un CALCUL par audit dans `logs`
+    return ([("load", lambda at: at.run(), None), ("login", login, ("logs", code)),
+             ("lock_audit", audit, ("logs", code))] + [("audit", audit, ("logs", code))] * (audits - 1))
+
+
+def guest_steps(nom, refreshes):
+    def sign(at):
+        _widget(at.text_input, "Votre Nom").input(nom)
+        _widget(at.text_input, "Entreprise").input("DI-SOLUTIONS")
+        at.text_area[0].input(f"Message de {nom}")
+        _button(at, "PUBLIER").click().run()
+
+    def refresh(at):
+        _button(at, "Actualiser").click().run()
+
+    return ([("load", lambda at: at.run(), None), ("sign", sign, ("guestbook", nom))]
+            + [("refresh", refresh, None)] * refreshes)
+
+
+STEPS = {"gen_control": technician_steps, "guestbook": guest_steps}
+KEY_COLUMN = {"logs": "code_utilise", "guestbook": "nom"}
+
+
+def free_codes(n, users):
+    """Codes ACTIF sans machine verrouillée (voir make_tables : pairs, hors multiples de 10)."""
+    codes = [f"GEN-{i:06d}" for i in range(users) if i % 2 == 0 and i % 10]
+    if len(codes) < n:
+        raise SystemExit(f"--rows trop petit pour {n} techniciens ({len(codes)} codes libres)")
+    return codes[:n]
+
+
+def found_rows(backend, start_rows, keys):
+    """Lignes ajoutées depuis le début du test, comptées par clé (code ou nom)."""
+    found = {}
+    for ws, start in start_rows.items():
+        df = backend.table(ws).iloc[start:]
+        found[ws] = collections.Counter(k for k in df[KEY_COLUMN[ws]].astype(str) if k in keys.get(ws, ()))
+    return found
+
+
+# --- Un processus = un serveur Streamlit avec ses sessions ---
+def worker(address, sessions, start_rows, timeout, settle, start, results):
+    manager = FakeBackendManager(address=address)
+    manager.connect()
+    backend = manager.backend()
+    st.connection = lambda *a, **k: RemoteGSheetsConnection(backend)
+
+    plans = []
+    for script, params in sessions:
+        at = AppTest.from_file(os.path.join(ROOT, f"{script}.py"), default_timeout=timeout)
+        at.secrets["storage"] = {}
+        plans.append((script, at, STEPS[script](*params)))
+    samples, failures, expected, state = [], collections.Counter(), collections.defaultdict(collections.Counter), []
+    start.wait()
+
+    # Sessions d'un même serveur jouées à tour de rôle, une interaction chacune
+    alive = set(range(len(plans)))
+    for k in range(max(len(p[2]) for p in plans)):
+        for i, (script, at, steps) in enumerate(plans):
+            if i not in alive or k >= len(steps):
+                continue
+            name, step, row = steps[k]
+            t0 = time.perf_counter()
+            try:
+                step(at)
+                error = at.exception[0].message if at.exception else None
+            except Exception as e:
+                error = repr(e)
+            samples.append((script, name, (time.perf_counter() - t0) * 1000))
+            if error:
+                failures[f"{script}/{name}: {error[:120]}"] += 1
+                alive.discard(i)
+            elif row:
+                # Interaction réussie : sa ligne doit finir dans la feuille
+                expected[row[0]][row[1]] += 1
+    done_at = time.time()
+    for script, at, _ in plans:
+        if script == "gen_control" and "user_info" in at.session_state:
+            state.append(dict(at.session_state["user_info"]))
+
+    # Le serveur reste en vie le temps que ses écrivains de fond vident leur file
+    deadline = time.monotonic() + settle
+    while time.monotonic() < deadline:
+        found = found_rows(backend, start_rows, expected)
+        if all(found[ws][k] >= n for ws, want in expected.items() for k, n in want.items()):
+            break
+        time.sleep(POLL_S)
+    results.put({"samples": samples, "failures": dict(failures), "state": state, "done_at": done_at,
+                 "expected": {ws: dict(c) for ws, c in expected.items()}, "drained_at": time.time()})
+
+
+def run(args):
+    manager = start_shared_backend({"users": args.rows, "logs": args.rows, "guestbook": args.rows},
+                                   latency_ms=args.latency_ms, write_quota=args.write_quota,
+                                   read_quota=args.read_quota)
+    backend = manager.backend()
+    start_rows = {ws: len(backend.table(ws)) for ws in KEY_COLUMN}
+    codes = free_codes(args.technicians, args.rows)
+
+    sessions = [("gen_control", (code, f"Site charge {i}", args.audits)) for i, code in enumerate(codes)]
+    sessions += [("guestbook", (f"Invité charge {i}", args.refreshes)) for i in range(args.guests)]
+    per = max(1, args.sessions_per_process)
+    groups = [sessions[i:i + per] for i in range(0, len(sessions), per)]
+
+    # fork : les processus démarrent sans réimporter Streamlit
+    ctx = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+    start = ctx.Barrier(len(groups) + 1)
+    results = ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(manager.address, g, start_rows, args.timeout, args.settle, start, results))
+             for g in groups]
+    for p in procs:
+        p.start()
+    start.wait()
+    t0 = time.time()
+    reports = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+
+    samples = [s for r in reports for s in r["samples"]]
+    failures = collections.Counter()
+    expected = collections.defaultdict(collections.Counter)
+    for r in reports:
+        failures.update(r["failures"])
+        for ws, c in r["expected"].items():
+            expected[ws].update(c)
+    elapsed = max(r["done_at"] for r in reports) - t0
+    drain = max(r["drained_at"] for r in reports) - max(r["done_at"] for r in reports)
+
+    found = found_rows(backend, start_rows, expected)
+    lost = {ws: sum(max(n - found[ws][k], 0) for k, n in expected[ws].items()) for ws in KEY_COLUMN}
+    duplicated = {ws: sum(max(found[ws][k] - n, 0) for k, n in expected[ws].items()) for ws in KEY_COLUMN}
+
+    users = backend.table("users").set_index("code_acces")["machine_lock"].astype(str)
+    state = [s for r in reports for s in r["state"]]
+    locks = {"posés": sum(bool(users[c].strip()) for c in codes),
+             "incohérents": sum(1 for s in state if s.get("machine") and users.get(s.get("code")) != s["machine"])}
+
+    by_step = collections.defaultdict(list)
+    for script, name, ms in samples:
+        by_step[(script, name)].append(ms)
+    steps = []
+    for (script, name), values in sorted(by_step.items()):
+        q = statistics.quantiles(values, n=100, method="inclusive") if len(values) > 1 else values * 99
+        steps.append({"script": script, "interaction": name, "n": len(values),
+                      "p50_ms": round(q[49], 1), "p99_ms": round(q[98], 1), "max_ms": round(max(values), 1)})
+    all_q = statistics.quantiles([s[2] for s in samples], n=100, method="inclusive") if len(samples) > 1 else [0.0] * 99
+    counters = backend.counters()
+    manager.shutdown()
+    return {
+        "sessions": {"technicians": args.technicians, "guests": args.guests, "processes": len(groups)},
+        "backend": {"rows": args.rows, "latency_ms": args.latency_ms,
+                    "write_quota": args.write_quota, "read_quota": args.read_quota},
+        "elapsed_s": round(elapsed, 2),
+        "interactions": len(samples),
+        "throughput_per_s": round(len(samples) / elapsed, 2) if elapsed > 0 else None,
+        "p50_ms": round(all_q[49], 1),
+        "p99_ms": round(all_q[98], 1),
+        "steps": steps,
+        "api_calls": counters["calls"],
+        "rate_limited": counters["errors"],
+        "failures": dict(failures),
+        "expected": {ws: sum(expected[ws].values()) for ws in KEY_COLUMN},
+        "lost": lost,
+        "duplicated": duplicated,
+        "drain_s": round(drain, 1),
+        "locks": locks,
+    }
+
+
+def print_report(r):
+    s = r["sessions"]
+    print(f"sessions      : {s['technicians']} techniciens, {s['guests']} invités sur {s['processes']} processus")
+    print(f"débit         : {r['interactions']} interactions en {r['elapsed_s']}s ({r['throughput_per_s']}/s), "
+          f"p50 {r['p50_ms']:.0f}ms  p99 {r['p99_ms']:.0f}ms")
+    for st_ in r["steps"]:
+        print(f"  {st_['script']:12s} {st_['interaction']:12s} n={st_['n']:<5d} p50 {st_['p50_ms']:>8.0f}ms  "
+              f"p99 {st_['p99_ms']:>8.0f}ms  max {st_['max_ms']:>8.0f}ms")
+    print(f"appels API    : {r['api_calls']}")
+    print(f"quota (429)   : {r['rate_limited'] or 0}")
+    print(f"échecs        : {r['failures'] or 0}")
+    print(f"lignes        : attendues {r['expected']}  perdues {r['lost']}  dupliquées {r['duplicated']}  "
+          f"(écrites {r['drain_s']}s après la dernière interaction)")
+    print(f"verrous       : {r['locks']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge : sessions Streamlit simultanées contre un faux Google Sheets")
+    parser.add_argument("--technicians", type=int, default=5, help="sessions gen_control.py")
+    parser.add_argument("--guests", type=int, default=10, help="sessions guestbook.py")
+    parser.add_argument("--audits", type=int, default=3, help="audits par technicien")
+    parser.add_argument("--refreshes", type=int, default=2, help="actualisations du mur par invité")
+    parser.add_argument("--sessions-per-process", type=int, default=1,
+                        help="sessions servies par chaque processus (1 = toutes en parallèle)")
+    parser.add_argument("--rows", type=int, default=1000, help="taille des feuilles simulées")
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--write-quota", type=int, help="écritures par minute avant HTTP 429")
+    parser.add_argument("--read-quota", type=int, help="lectures par minute avant HTTP 429")
+    parser.add_argument("--settle", type=float, default=30.0, help="attente max. des écritures de fond (s)")
+    parser.add_argument("--timeout", type=float, default=300.0, help="délai max. d'une interaction (s)")
+    parser.add_argument("--out", help="fichier JSON du rapport")
+    args = parser.parse_args()
+    out = os.path.abspath(args.out) if args.out else None
+
+    # Répertoire de travail jetable (partagé par les processus, comme sur un même serveur)
+    workdir = tempfile.mkdtemp(prefix="load-")
+    os.symlink(os.path.join(ROOT, "logo_gim.jpg"), os.path.join(workdir, "logo_gim.jpg"))
+    os.chdir(workdir)
+
+    report = run(args)
+    print_report(report)
+    if out:
+        with open(out, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    sys.exit(1 if any(report["lost"].values()) or report["locks"]["incohérents"] else 0)
+
+
+if __name__ == "__main__":
+    main()
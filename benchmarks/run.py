@@ -0,0 +1,181 @@
+# ==============================================================================
+# BENCHMARK : LATENCE DES RERUNS DE gen_control.py ET guestbook.py
+# Exécute les scripts sans navigateur (Streamlit AppTest) contre un faux backend
+# Google Sheets de taille et latence réglables, et produit un rapport JSON.
+#
+#   python benchmarks/run.py --rows 1000 10000 200000 --latency-ms 0 50 --out bench.json
+#   python benchmarks/run.py --rows 1000 --compare bench.json
+# ==============================================================================
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+import streamlit as st  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from fake_gsheets import FakeGSheetsConnection, make_tables  # noqa: E402
+
+SETTLE_S = 3.0  # laisse les écrivains de fond vider leur file avant le bilan
+
+
+def _button(at, text):
+    return next(b for b in at.button if text in b.label)
+
+
+def _widget(widgets, label):
+    return next(w for w in widgets if w.label.startswith(label))
+
+
+# --- Parcours simulés : (nom de l'interaction, action sur l'AppTest) ---
+def gen_control_steps(code):
+    def login(at):
+        _widget(at.text_input, "CODE LICENCE").input(code)
+        _button(at, "DÉVERROUILLER").click().run()
+
+    def audit(at):
+        site = _widget(at.text_input, "MATÉRIEL")
+        if not site.disabled:
+            site.input("Bench Site").run()
+        _button(at, "LANCER L'AUDIT").click().run()
+
+    return [("load", lambda at: at.run()), ("login", login), ("audit", audit), ("audit_again", audit)]
+
+
+def guestbook_steps():
+    def sign(at):
+        _widget(at.text_input, "Votre Nom").input("Bench")
+        _widget(at.text_input, "Entreprise").input("DI-SOLUTIONS")
+        at.text_area[0].input("Message de benchmark")
+        _button(at, "PUBLIER").click().run()
+
+    def refresh(at):
+        _button(at, "Actualiser").click().run()
+
+    return [("load", lambda at: at.run()), ("sign", sign), ("refresh", refresh), ("refresh_again", refresh)]
+
+
+SCRIPTS = {
+    # Un code ACTIF sans machine verrouillée (voir make_tables)
+    "gen_control": lambda rows: gen_control_steps(f"GEN-{2 if rows > 2 else 0:06d}"),
+    "guestbook": lambda rows: guestbook_steps(),
+}
+
+
+def run_scenario(script, rows, latency_ms):
+    fake = FakeGSheetsConnection(make_tables(users=rows, logs=rows, guestbook=rows), latency_ms=latency_ms)
+    st.connection = lambda *args, **kwargs: fake
+    st.cache_resource.clear()
+
+    at = AppTest.from_file(os.path.join(ROOT, f"{script}.py"), default_timeout=600)
+    at.secrets["storage"] = {}
+    results = []
+    for name, step in SCRIPTS[script](rows):
+        calls, nbytes = dict(fake.calls), sum(fake.bytes.values())
+        t0 = time.perf_counter()
+        step(at)
+        wall_ms = (time.perf_counter() - t0) * 1000
+        if at.exception:
+            raise RuntimeError(f"{script}/{name}: {at.exception[0].message}")
+        results.append({
+            "interaction": name,
+            "wall_ms": wall_ms,
+            "calls": {op: n - calls.get(op, 0) for op, n in fake.calls.items() if n - calls.get(op, 0)},
+            "bytes": sum(fake.bytes.values()) - nbytes,
+        })
+    time.sleep(SETTLE_S)
+    return results, dict(fake.calls), sum(fake.bytes.values())
+
+
+def run(rows_list, latencies, repeat):
+    report = []
+    for script in SCRIPTS:
+        for rows in rows_list:
+            for latency in latencies:
+                runs = [run_scenario(script, rows, latency) for _ in range(repeat)]
+                for i, first in enumerate(runs[0][0]):
+                    walls = [r[0][i]["wall_ms"] for r in runs]
+                    report.append({
+                        "script": script, "rows": rows, "latency_ms": latency,
+                        "interaction": first["interaction"],
+                        "wall_ms": statistics.median(walls), "wall_ms_max": max(walls),
+                        "calls": first["calls"], "bytes": first["bytes"],
+                    })
+                report.append({
+                    "script": script, "rows": rows, "latency_ms": latency, "interaction": "TOTAL",
+                    "wall_ms": statistics.median(sum(s["wall_ms"] for s in r[0]) for r in runs),
+                    "calls": runs[0][1], "bytes": runs[0][2],
+                })
+                print(f"{script:12s} rows={rows:<7d} latency={latency:>5.0f}ms  "
+                      + "  ".join(f"{r['interaction']}={r['wall_ms']:.0f}ms" for r in report[-len(runs[0][0]) - 1:]))
+    return report
+
+
+def _key(r):
+    return (r["script"], r["rows"], r["latency_ms"], r["interaction"])
+
+
+def compare(report, baseline, tolerance):
+    """Liste des interactions plus lentes que la référence au-delà de la tolérance."""
+    old = {_key(r): r for r in baseline["results"]}
+    regressions = []
+    for r in report:
+        ref = old.get(_key(r))
+        if ref and r["wall_ms"] > ref["wall_ms"] * (1 + tolerance) and r["wall_ms"] - ref["wall_ms"] > 5:
+            regressions.append((r, ref))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des reruns Streamlit contre un faux Google Sheets")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--latency-ms", type=float, nargs="+", default=[0.0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", help="fichier JSON du rapport")
+    parser.add_argument("--compare", help="rapport JSON de référence")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="ralentissement toléré (0.25 = +25%%)")
+    args = parser.parse_args()
+    out = os.path.abspath(args.out) if args.out else None
+    ref = os.path.abspath(args.compare) if args.compare else None
+
+    # Répertoire de travail jetable : les fichiers locaux (file des signatures...) n'y survivent pas
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    os.symlink(os.path.join(ROOT, "logo_gim.jpg"), os.path.join(workdir, "logo_gim.jpg"))
+    os.chdir(workdir)
+
+    results = run(args.rows, args.latency_ms, args.repeat)
+    try:
+        commit = subprocess.run(["git", "-C", ROOT, "rev-parse", "--short", "HEAD"],
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    report = {
+        "meta": {"commit": commit, "date": time.strftime("%Y-%m-%d %H:%M:%S"), "python": platform.python_version(),
+                 "streamlit": st.__version__, "repeat": args.repeat},
+        "results": results,
+    }
+    if out:
+        with open(out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if ref:
+        with open(ref) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for r, old in regressions:
+            print(f"RÉGRESSION {r['script']}/{r['interaction']} rows={r['rows']} latency={r['latency_ms']}: "
+                  f"{old['wall_ms']:.0f}ms -> {r['wall_ms']:.0f}ms")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,24 @@ import streamlit as st
 from streamlit_gsheets import GSheetsConnection
 import pandas as pd
 from datetime import datetime
+import io
+import time
 import urllib.parse
 
+import ammeter
+import baselines
+import profiles
+import storage
+import tracing
+import usage
+import willans
+from licenses import LicenseDirectory
+from log_writer import LogWriter
+
 # ==========================================
 # 1. CONFIGURATION & DESIGN (V2.5)
 # ==========================================
+_rerun_t0 = time.perf_counter()
 st.set_page_config(
     page_title="GEN-CONTROL V2.5",
     page_icon="🛡️",
@@ -52,8 +65,19 @@ st.markdown("""
 # ==========================================
 # 2. CONNEXION DATABASE
 # ==========================================
+# Instrumentation : section [tracing] des secrets (sample_rate, sink), voir tracing.py
+@st.cache_resource
+def init_tracing():
+    tracing.configure(**st.secrets.get("tracing", {}))
+
+# Backend choisi par la section [storage] des secrets (Google Sheets par défaut, voir storage.py)
+@st.cache_resource
+def get_storage():
+    return storage.from_config(st.secrets.get("storage", {}), lambda: st.connection("gsheets", type=GSheetsConnection))
+
 try:
-    conn = st.connection("gsheets", type=GSheetsConnection)
+    init_tracing()
+    db = get_storage()
 except:
     st.error("⚠️ Erreur réseau. Vérifiez votre connexion.")
     st.stop()
@@ -71,33 +95,225 @@ if 'audit_result' not in st.session_state:
 # ==========================================
 # 4. LOGIQUE MÉTIER
 # ==========================================
+# Journal : ajout par lots en tâche de fond (plus de lecture/réécriture complète de "logs")
+LOG_BATCH_SIZE = 20
+LOG_FLUSH_INTERVAL = 2.0  # secondes
+
+@st.cache_resource
+def get_log_writer():
+    return LogWriter(lambda rows: db.append("logs", rows),
+                     batch_size=LOG_BATCH_SIZE, flush_interval=LOG_FLUSH_INTERVAL)
+
 def log_action(code, action, details="-"):
     try:
-        df_logs = conn.read(worksheet="logs", ttl=0, usecols=[0, 1, 2, 3])
-        new_entry = pd.DataFrame([{
-            "date_heure": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "code_utilise": code,
-            "action": action,
-            "details": details
-        }])
-        updated_logs = pd.concat([df_logs, new_entry], ignore_index=True)
-        conn.update(worksheet="logs", data=updated_logs)
+        with tracing.span("gen_control.log_action"):
+            get_log_writer().submit([datetime.now().strftime("%Y-%m-%d %H:%M:%S"), code, action, details])
     except:
         pass
 
+# Annuaire des licences : index partagé, rechargé au plus tard toutes les LICENSE_TTL secondes
+LICENSE_TTL = 60
+
+@st.cache_resource
+def get_license_directory():
+    # Avec un cache partagé, une écriture dans `users` faite par un autre serveur invalide l'index
+    return LicenseDirectory(lambda: db.read("users"), ttl=LICENSE_TTL, version_fn=lambda: db.version("users"))
+
+# Profils matériel (profiles.json) : lus et indexés une fois par processus
+@st.cache_resource
+def get_profiles():
+    return profiles.load()
+
+# Références par matériel (moyenne / dispersion de l'écart), fichier SQLite local
+@st.cache_resource
+def get_baselines():
+    return baselines.BaselineStore(st.secrets.get("baselines", {}).get("path", "baselines.db"))
+
 def check_login(code_input):
     try:
-        df_users = conn.read(worksheet="users", ttl=0, usecols=[0, 1, 2, 3, 4])
-        df_users['code_acces'] = df_users['code_acces'].astype(str).str.strip()
-        user_row = df_users[(df_users['code_acces'] == code_input) & (df_users['statut'] == 'ACTIF')]
-        if not user_row.empty:
-            machine_lock = user_row.iloc[0].get('machine_lock')
-            if pd.isna(machine_lock) or str(machine_lock).strip() == "": machine_lock = None
-            return True, user_row.iloc[0]['client_nom'], machine_lock
+        with tracing.span("gen_control.check_login"):
+            entry = get_license_directory().lookup(code_input)
+        if entry and entry['statut'] == 'ACTIF':
+            return True, entry['client_nom'], entry['machine_lock']
         return False, None, None
     except:
         return False, None, None
 
+# Audit de flotte : le CSV est lu par blocs pour borner la mémoire
+FLEET_CHUNK_ROWS = 200_000
+
+def render_fleet_audit():
+    st.markdown("### 📂 AUDIT DE FLOTTE (CSV)")
+    st.caption("Colonnes requises : " + ", ".join(willans.COLONNES) + " — optionnelles : prix, csp, friction, et toute colonne d'identification (site, date...).")
+    c_s, c_p = st.columns(2)
+    with c_s:
+        sep = st.selectbox("SÉPARATEUR", [";", ","])
+    with c_p:
+        prix = st.number_input("PRIX DU LITRE (si absent du fichier)", value=willans.PRIX_DEFAUT)
+    fichier = st.file_uploader("FICHIER DE CONSOMMATION", type=["csv"])
+    if fichier is None:
+        return
+    if st.button("AUDITER LA FLOTTE 🚀", type="primary", use_container_width=True):
+        out = io.BytesIO()
+        bar = st.progress(0.0)
+        n = n_anomalies = 0
+        perte_totale = 0.0
+        try:
+            for i, chunk in enumerate(pd.read_csv(fichier, sep=sep, chunksize=FLEET_CHUNK_ROWS)):
+                with tracing.span("gen_control.fleet_chunk"):
+                    res = willans.audit_dataframe(chunk, prix=prix)
+                anomalies = res["verdict"] == "SURCONSO"
+                n += len(res)
+                n_anomalies += int(anomalies.sum())
+                perte_totale += float(res.loc[anomalies, "perte_fcfa"].sum())
+                res.to_csv(out, sep=sep, index=False, header=(i == 0), float_format="%.2f")
+                bar.progress(min(fichier.tell() / max(fichier.size, 1), 1.0))
+        except ValueError as e:
+            st.error(f"Fichier invalide : {e}")
+            return
+        bar.progress(1.0)
+        st.session_state.fleet_result = {"n": n, "anomalies": n_anomalies, "perte": perte_totale, "csv": out.getvalue(), "nom": fichier.name}
+        log_action(st.session_state.user_info['code'], "FLOTTE", f"{n} lignes | {n_anomalies} anomalies | {perte_totale:.0f}F")
+
+    r = st.session_state.get('fleet_result')
+    if r:
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Lignes auditées", f"{r['n']:,}")
+        c2.metric("Anomalies", f"{r['anomalies']:,}")
+        c3.metric("Perte détectée", f"{r['perte']:,.0f} F")
+        st.download_button("📥 TÉLÉCHARGER LE RÉSULTAT", r['csv'], file_name=f"audit_{r['nom']}", mime="text/csv", use_container_width=True)
+
+# Enregistreur ampèremétrique : CSV (une colonne de courant) ou binaire float32 little-endian,
+# intégré par blocs ; le résultat est gardé en session tant que fichier et réglages sont inchangés.
+# Le téléversement lui-même est tenu en mémoire par Streamlit (taille max : .streamlit/config.toml)
+def render_logger_profile(i_max, puissance_kw, classe):
+    fichier = st.file_uploader("FICHIER ENREGISTREUR (CSV ou binaire float32)", type=["csv", "txt", "bin", "f32"])
+    c_t, c_s = st.columns(2)
+    with c_t:
+        periode = st.number_input("PÉRIODE D'ÉCHANTILLONNAGE (s)", min_value=0.1, value=1.0, step=0.5)
+    with c_s:
+        sep = st.selectbox("SÉPARATEUR (CSV)", [";", ","], key="logger_sep")
+    if fichier is None:
+        return None
+    binaire = not fichier.name.lower().endswith((".csv", ".txt"))
+    colonne = None
+    if not binaire:
+        try:
+            entetes = list(pd.read_csv(fichier, sep=sep, nrows=0).columns)
+        except ValueError as e:
+            st.error(f"Fichier invalide : {e}")
+            return None
+        colonne = st.selectbox("COLONNE COURANT (A)", entetes, index=len(entetes) - 1)
+
+    cle = (fichier.file_id, periode, sep, colonne, i_max, puissance_kw, classe['id'])
+    cache = st.session_state.get('logger_profile')
+    if not cache or cache[0] != cle:
+        fichier.seek(0)
+        blocs = ammeter.binary_chunks(fichier.getbuffer()) if binaire else ammeter.csv_chunks(fichier, colonne, sep)
+        try:
+            with tracing.span("gen_control.logger_profile"), st.spinner("Intégration du profil..."):
+                profil = ammeter.integrate(blocs, i_max, puissance_kw, periode,
+                                           csp=classe['csp'], friction=classe['friction'])
+        except ValueError as e:
+            st.error(f"Fichier invalide : {e}")
+            return None
+        cache = st.session_state.logger_profile = (cle, profil)
+    profil = cache[1]
+    if not profil['echantillons']:
+        st.error("Aucun échantillon de courant exploitable.")
+        return None
+
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Durée enregistrée", f"{profil['heures']:.1f} h")
+    c2.metric("Charge équivalente", f"{profil['charge_moy']:.0%}")
+    c3.metric("Charge max", f"{profil['charge_max']:.0%}")
+    classes = [f"{b:.0%}" for b in ammeter.HIST_BINS[:-1]]
+    st.caption("Heures par classe de charge")
+    st.bar_chart(pd.DataFrame({"heures": profil['histogramme']}, index=classes))
+    st.caption(f"Pics de charge (fenêtres de {ammeter.PEAK_WINDOW_S // 60} min)")
+    st.dataframe(pd.DataFrame({
+        "début": [f"J+{int(h // 24)} {int(h % 24):02d}:{int(h * 60 % 60):02d}" for h, _ in profil['pics']],
+        "charge": [f"{c:.0%}" for _, c in profil['pics']],
+    }), use_container_width=True, hide_index=True)
+    return profil
+
+# Monitoring (codes listés dans la section [admin] des secrets)
+def is_admin(code):
+    try:
+        return code in st.secrets.get("admin", {}).get("codes", [])
+    except:
+        return False
+
+def render_monitoring():
+    st.markdown("### 📊 MONITORING")
+    st.caption("Spans chronométrés depuis le démarrage du processus (ms).")
+    spans = tracing.snapshot()
+    if spans:
+        st.dataframe(pd.DataFrame(spans).round(1), use_container_width=True, hide_index=True)
+    else:
+        st.info("Aucune mesure (tracing désactivé ?).")
+    c1, c2 = st.columns(2)
+    with c1:
+        st.markdown("**Journal (logs)**")
+        st.json(get_log_writer().stats())
+    with c2:
+        st.markdown("**Annuaire des licences**")
+        st.json(get_license_directory().stats)
+    backend = db.stats()
+    if backend:
+        st.markdown("**Stockage (pool, commits groupés, cache partagé)**")
+        st.json(backend)
+    quotas = db.io_stats()
+    if quotas:
+        st.markdown("**Quotas Google Sheets (dernière minute)**")
+        st.dataframe(pd.DataFrame(quotas).fillna(0), use_container_width=True, hide_index=True)
+    if st.button("Remettre à zéro"):
+        tracing.reset()
+        st.rerun()
+
+# Statistiques d'utilisation : agrégats du journal tenus à jour incrémentalement
+@st.cache_resource
+def get_usage():
+    return usage.UsageAggregates(db, st.secrets.get("usage", {}).get("path", "usage.parquet"))
+
+def render_usage():
+    st.markdown("### 📈 UTILISATION")
+    agg = get_usage()
+    with tracing.span("gen_control.usage_refresh"):
+        agg.refresh(force=st.button("Actualiser"))
+    df = agg.frame()
+    if df.empty:
+        st.info("Journal vide.")
+        return
+    st.caption(f"{agg.position:,} lignes de journal agrégées.")
+    par_action = df.groupby("action")[["n", "audits", "surconso", "perte"]].sum()
+    calc = par_action.reindex(["CALCUL", "FLOTTE"]).fillna(0).sum()
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Connexions", f"{int(par_action['n'].get('LOGIN', 0)):,}")
+    c2.metric("Audits", f"{int(calc['audits']):,}")
+    c3.metric("Taux d'anomalie", f"{calc['surconso'] / calc['audits']:.1%}" if calc['audits'] else "-")
+    c4.metric("Pertes détectées", f"{calc['perte']:,.0f} F")
+
+    st.caption("Activité par jour")
+    jours = df.pivot_table(index="jour", columns="action", values="n", aggfunc="sum", fill_value=0)
+    st.bar_chart(jours.sort_index().tail(90))
+
+    st.caption("Par code licence")
+    codes = df[df["action"].isin(["CALCUL", "FLOTTE"])].groupby("code")[["audits", "surconso", "sousconso", "perte", "ecart_sum"]].sum()
+    n_calcul = df[df["action"] == "CALCUL"].groupby("code")["n"].sum()
+    licences = get_license_directory()
+    def client(code):
+        try:
+            entry = licences.lookup(code)
+            return entry['client_nom'] if entry else ""
+        except:
+            return ""
+    codes.insert(0, "client", [client(c) for c in codes.index])
+    codes["taux_anomalie"] = (codes["surconso"] / codes["audits"].where(codes["audits"] > 0)).round(3)
+    codes["ecart_moyen_pct"] = (codes["ecart_sum"] / n_calcul.reindex(codes.index)).round(1)
+    st.dataframe(codes.drop(columns="ecart_sum").sort_values("perte", ascending=False),
+                 use_container_width=True)
+
 # ==========================================
 # 5. ÉCRAN LOGIN
 # ==========================================
@@ -129,11 +345,30 @@ else:
         st.success(f"👤 **{st.session_state.user_info['nom']}**")
         if st.session_state.user_info.get('machine'):
              st.info(f"🔒 Lié à : {st.session_state.user_info['machine']}")
+        modes = ["🔎 Audit unitaire", "📂 Audit flotte (CSV)"]
+        if is_admin(st.session_state.user_info['code']): modes += ["📊 Monitoring", "📈 Utilisation"]
+        mode_app = st.radio("MODE", modes)
         if st.button("Déconnexion"):
             st.session_state.authenticated = False
             st.session_state.audit_result = None
+            st.session_state.pop('fleet_result', None)
             st.rerun()
 
+    if "Monitoring" in mode_app:
+        render_monitoring()
+        st.markdown('<div class="footer">GEN-CONTROL V2.5 © DI-SOLUTIONS</div>', unsafe_allow_html=True)
+        st.stop()
+
+    if "Utilisation" in mode_app:
+        render_usage()
+        st.markdown('<div class="footer">GEN-CONTROL V2.5 © DI-SOLUTIONS</div>', unsafe_allow_html=True)
+        st.stop()
+
+    if "flotte" in mode_app:
+        render_fleet_audit()
+        st.markdown('<div class="footer">GEN-CONTROL V2.5 © DI-SOLUTIONS</div>', unsafe_allow_html=True)
+        st.stop()
+
     st.markdown("### ⛽ GEN-CONTROL V2.5")
     st.caption("Powered by Cabinet DI-SOLUTIONS")
     st.markdown("---")
@@ -151,51 +386,62 @@ else:
 
     # 2. SÉLECTEUR MATÉRIEL
     st.markdown("<br>", unsafe_allow_html=True)
-    type_equipement = st.radio("TYPE DE MATÉRIEL", ["🏭 GROUPE ÉLECTROGÈNE", "🚛 CAMION / ENGIN TP"], horizontal=True)
+    profils = get_profiles()
+    classe_id = st.radio("TYPE DE MATÉRIEL", profils.classes.ids, format_func=profils.classes.label, horizontal=True)
+    classe = profils.classes[classe_id]
 
     facteur_charge = 0.0
     puissance_kw_calcul = 0.0
     mode_calcul = ""
+    source_charge = "charge_scenario"  # clé d'incertitude du mode confiance
+    heures_enregistrees = None
+    profil_manquant = False  # mode fichier sans profil exploitable : pas d'audit
 
     # ---------------------------------------------------------
     # LOGIQUE GROUPE
     # ---------------------------------------------------------
-    if "GROUPE" in type_equipement:
+    if classe['type'] == "groupe":
         c_p, c_u = st.columns(2)
         with c_p:
-            puissance_input = st.number_input("PUISSANCE GROUPE (kVA)", 10, 5000, 100)
-            puissance_kw_calcul = puissance_input * 0.8
+            puissance_input = st.number_input(f"PUISSANCE GROUPE ({classe['unite']})", classe['min'], classe['max'], classe['defaut'])
+            puissance_kw_calcul = profils.puissance_kw(classe_id, puissance_input)
         with c_u:
-            scenario = st.selectbox("PROFIL UTILISATION", [
-                "⚡ Ampèremètre (Précis)",
-                "🏢 Bureaux / Hôtel (Faible) - 30%",
-                "🏪 Standard (Moyen) - 50%",
-                "🏗️ Industrie (Élevé) - 75%",
-                "🔥 Pleine Charge - 90%"
-            ])
+            scenario = profils.profils_groupe[st.selectbox("PROFIL UTILISATION", profils.profils_groupe.ids,
+                                                           format_func=profils.profils_groupe.label)]
             
-            if "Ampèremètre" in scenario:
-                i_max = puissance_input * 1.44
+            i_max = puissance_input * classe['amperes_par_unite']
+            if scenario.get('saisie') == "fichier":
+                st.caption(f"I Max : {i_max:.0f} A")
+            elif scenario.get('saisie') == "mesure":
                 st.caption(f"I Max : {i_max:.0f} A")
                 amp = st.number_input("Ampères Lus (A)", 0.0, float(i_max*1.1))
                 if i_max > 0: facteur_charge = amp / i_max
                 mode_calcul = f"Mesure {amp}A"
+                source_charge = "charge_mesure"
             else:
-                if "30%" in scenario: facteur_charge = 0.30
-                elif "50%" in scenario: facteur_charge = 0.50
-                elif "75%" in scenario: facteur_charge = 0.75
-                elif "90%" in scenario: facteur_charge = 0.90
-                mode_calcul = scenario
+                facteur_charge = scenario['charge']
+                mode_calcul = scenario['label']
+
+        if scenario.get('saisie') == "fichier":
+            # Charge équivalente du profil enregistré : la conso horaire étant affine
+            # en charge, Willans sur la moyenne = intégrale sur le profil
+            profil = render_logger_profile(i_max, puissance_kw_calcul, classe)
+            profil_manquant = not profil
+            if profil:
+                facteur_charge = profil['charge_moy']
+                heures_enregistrees = profil['heures']
+                mode_calcul = f"Enregistreur {profil['heures']:.1f} h (max {profil['charge_max']:.0%})"
+                source_charge = "charge_mesure"
 
     # ---------------------------------------------------------
     # LOGIQUE CAMION (AVEC MODE STATIQUE / PTO)
     # ---------------------------------------------------------
-    else: 
+    elif classe['type'] == "vehicule":
         c_p, c_u = st.columns(2)
         with c_p:
-            puissance_input = st.number_input("PUISSANCE MOTEUR (CV)", 50, 1000, 400)
+            puissance_input = st.number_input(f"PUISSANCE MOTEUR ({classe['unite']})", classe['min'], classe['max'], classe['defaut'])
             # P_max moteur en kW
-            p_max_kw = puissance_input * 0.7355 
+            p_max_kw = profils.puissance_kw(classe_id, puissance_input)
             puissance_kw_calcul = p_max_kw # Par défaut, on part du moteur global
         
         with c_u:
@@ -203,87 +449,89 @@ else:
             mode_camion = st.radio("SITUATION", ["🛣️ Roulage (Route)", "🛑 Statique / Prise de Force (PTO)"])
         
         if mode_camion == "🛣️ Roulage (Route)":
-            scenario = st.selectbox("TYPE DE TRAJET", [
-                "Vide / Eco / Plat (15%)",
-                "Mixte / Ville (25%)",
-                "Chargé / Vallonné (40%)",
-                "Chantier Difficile (60%)"
-            ])
-            if "15%" in scenario: facteur_charge = 0.15
-            elif "25%" in scenario: facteur_charge = 0.25
-            elif "40%" in scenario: facteur_charge = 0.40
-            elif "60%" in scenario: facteur_charge = 0.60
-            mode_calcul = f"Roulage ({scenario})"
+            scenario = profils.trajets[st.selectbox("TYPE DE TRAJET", profils.trajets.ids, format_func=profils.trajets.label)]
+            facteur_charge = scenario['charge']
+            mode_calcul = f"Roulage ({scenario['label']})"
             
         else: # MODE STATIQUE (L'INNOVATION)
             st.info("ℹ️ Calcul basé sur la puissance de l'équipement auxiliaire (Toupie, Grue...).")
-            equipement_pto = st.selectbox("QUOI TOURNE ?", [
-                "🔄 Toupie Béton (Malaxage) - ~20 kW",
-                "🏗️ Grue / Bras Hydraulique - ~30 kW",
-                "❄️ Frigo / Clim (Ralenti) - ~10 kW",
-                "🚜 Forage / Compresseur - ~45 kW"
-            ])
-            
-            # Ici on force la puissance utilisée, on ignore le % du gros moteur
-            p_utile = 0
-            if "Toupie" in equipement_pto: p_utile = 20
-            elif "Grue" in equipement_pto: p_utile = 30
-            elif "Frigo" in equipement_pto: p_utile = 10
-            elif "Forage" in equipement_pto: p_utile = 45
+            equipement_pto = st.selectbox("QUOI TOURNE ?", profils.pto.ids, format_func=profils.pto.label)
             
-            # On recalcule le facteur de charge par rapport au moteur principal
+            # Ici on force la puissance utilisée, on ignore le % du gros moteur :
+            # kW de l'accessoire rapportés au moteur principal + marge de friction (profiles.json)
             # Ex: 20 kW sur un moteur de 294 kW (400CV) = 6.8% de charge
-            if p_max_kw > 0:
-                facteur_charge = p_utile / p_max_kw
-                # On ajoute une petite marge de friction moteur (5%)
-                facteur_charge += 0.05 
+            facteur_charge = profils.charge_pto(equipement_pto, p_max_kw)
+            source_charge = "charge_pto"
             
-            mode_calcul = f"Statique ({equipement_pto})"
+            mode_calcul = f"Statique ({profils.pto.label(equipement_pto)})"
 
     # 3. DONNÉES CONSO
     st.markdown("---")
     c_h, c_l, c_p = st.columns(3)
     with c_h:
-        heures = st.number_input("DURÉE (Heures)", min_value=0.5, value=8.0, step=0.5)
+        heures = st.number_input("DURÉE (Heures)", min_value=0.5, step=0.5,
+                                 value=max(0.5, round(heures_enregistrees, 2)) if heures_enregistrees else 8.0)
     with c_l:
         litres = st.number_input("CONSO DÉCLARÉE (L)", min_value=0.0, value=50.0)
     with c_p:
         prix = st.number_input("PRIX DU LITRE", value=828)
 
+    confiance = st.checkbox("🎲 MODE CONFIANCE (intervalle Monte Carlo)",
+                            help=f"{willans.MC_TIRAGES:,} tirages sur la charge, la CSP et les heures.")
+
     # BOUTON CALCUL
     st.markdown("<br>", unsafe_allow_html=True)
     if st.button("LANCER L'AUDIT V2.5 🚀", type="primary", use_container_width=True):
         if not entreprise:
             st.error("Nom du site requis.")
+        elif profil_manquant:
+            st.error("Chargez un fichier enregistreur avec des échantillons exploitables avant de lancer l'audit.")
         else:
-            # ENREGISTREMENT LOCK
+            # ENREGISTREMENT LOCK (une seule cellule, uniquement si encore vide)
             if not st.session_state.user_info.get('machine'):
                 try:
-                    df_users = conn.read(worksheet="users", ttl=0)
-                    mask = df_users['code_acces'].astype(str).str.strip() == st.session_state.user_info['code']
-                    if mask.any():
-                        idx = df_users.index[mask][0]
-                        df_users.at[idx, 'machine_lock'] = entreprise
-                        conn.update(worksheet="users", data=df_users)
-                        st.session_state.user_info['machine'] = entreprise
-                        st.rerun()
+                    code = st.session_state.user_info['code']
+                    licences = get_license_directory()
+                    with tracing.span("gen_control.machine_lock"):
+                        entry = licences.lookup(code)
+                        lock = entry['machine_lock'] if entry else None
+                        if not lock:
+                            lock = db.update_cell_if_empty("users", "code_acces", code, "machine_lock", entreprise)
+                    if lock:
+                        # Si une autre session a verrouillé avant nous, on audite le matériel lié
+                        entreprise = lock
+                        st.session_state.user_info['machine'] = lock
+                        licences.update(code, machine_lock=lock)
                 except: pass
 
-            # MOTEUR WILLANS
-            csp = 0.24
-            # Formule : P_nom * CSP * (Friction + 0.9 * Charge)
-            # Friction à vide = 8%
-            conso_h_theo = puissance_kw_calcul * csp * (0.08 + (0.92 * facteur_charge))
-            
-            total_theo = conso_h_theo * heures
-            ecart = litres - total_theo
-            ecart_pct = (ecart / total_theo) * 100 if total_theo > 0 else 0
-            perte = ecart * prix
+            # MOTEUR WILLANS (voir willans.py)
+            with tracing.span("gen_control.willans"):
+                res = willans.audit(puissance_kw_calcul, facteur_charge, heures, litres, prix,
+                                    csp=classe['csp'], friction=classe['friction'])
+            ecart_pct = float(res["pct"])
+            perte = float(res["perte"])
+
+            mc = None
+            if confiance:
+                inc = profils.incertitudes
+                with tracing.span("gen_control.monte_carlo"):
+                    mc = willans.monte_carlo(puissance_kw_calcul, facteur_charge, heures, litres,
+                                             csp=classe['csp'], friction=classe['friction'],
+                                             sigma_charge=inc[source_charge], sigma_csp=inc['csp'],
+                                             sigma_heures=inc['heures'])
+
+            # Écart comparé à l'historique de ce matériel (puis ajouté à sa référence)
+            ref = None
+            try:
+                with tracing.span("gen_control.baseline"):
+                    ref = get_baselines().update(st.session_state.user_info['code'], entreprise, ecart_pct)
+            except: pass
 
             st.session_state.audit_result = {
-                "theo": total_theo, "reel": litres, "ecart": ecart,
+                "theo": float(res["theo"]), "reel": litres, "ecart": float(res["ecart"]),
                 "pct": ecart_pct, "perte": perte, "site": entreprise,
-                "charge": facteur_charge, "mode": mode_calcul
+                "charge": facteur_charge, "mode": mode_calcul, "verdict": int(res["verdict"]), "mc": mc,
+                "ref": ref
             }
             log_action(st.session_state.user_info['code'], "CALCUL", f"{ecart_pct:.1f}% | {perte:.0f}F")
 
@@ -292,18 +540,7 @@ else:
         r = st.session_state.audit_result
         st.markdown("---")
         
-        if r['ecart'] > (r['theo'] * 0.10):
-            color = "#FF4B4B"
-            msg = "ANOMALIE : SURCONSOMMATION"
-            icon = "🚨"
-        elif r['ecart'] < -(r['theo'] * 0.10):
-            color = "#FFA500"
-            msg = "SOUS-CONSOMMATION (Check données)"
-            icon = "⚠️"
-        else:
-            color = "#00C853"
-            msg = "COHÉRENT (RAS)"
-            icon = "✅"
+        msg, color, icon = willans.VERDICTS[r['verdict']]
 
         st.markdown(f"""
         <div style="background-color: {color}20; border: 2px solid {color}; padding: 15px; border-radius: 10px; text-align: center;">
@@ -316,6 +553,21 @@ else:
         c2.metric("Déclaré", f"{r['reel']:.1f} L")
         c3.metric("Écart", f"{r['ecart']:+.1f} L", delta_color="inverse" if color=="#FF4B4B" else "normal")
 
+        mc = r.get('mc')
+        if mc:
+            m1, m2 = st.columns(2)
+            m1.metric(f"Théorique (IC {mc['niveau']:.0%})", f"{mc['theo_bas']:.1f} – {mc['theo_haut']:.1f} L")
+            m2.metric("Proba. surconsommation", f"{mc['p_surconso']:.0%}",
+                      f"{mc['p_anomalie']:.0%} au-delà de la tolérance", delta_color="off")
+
+        ref = r.get('ref')
+        if ref and ref['n'] >= baselines.MIN_AUDITS:
+            habituel = f"Écart habituel de ce matériel : {ref['mean']:+.1f}% ± {ref['std']:.1f} ({ref['n']} audits, tendance {ref['ewma']:+.1f}%)"
+            if ref['anormal']:
+                st.warning(f"📈 ÉCART INHABITUEL POUR CE MATÉRIEL ({ref['z']:+.1f} σ). {habituel}")
+            else:
+                st.caption(habituel)
+
         if "ANOMALIE" in msg:
             st.error(f"PERTE : {r['perte']:,.0f} FCFA")
             link = f"https://wa.me/237671894095?text=Alerte%20{r['site']}%20Ecart%20{r['ecart']:.0f}L"
@@ -331,6 +583,9 @@ f"""AUDIT GEN-CONTROL V2.5
 📉 Théorique : {r['theo']:.1f} L
 ⚠️ ÉCART : {r['ecart']:+.1f} L ({r['pct']:+.1f}%)
 💰 VALEUR : {r['perte']:,.0f} FCFA
-Verdict : {msg}""", height=200)
+Verdict : {msg}""" + (f"""
+🎲 IC {mc['niveau']:.0%} théorique : {mc['theo_bas']:.1f} – {mc['theo_haut']:.1f} L
+🎲 P(surconsommation) : {mc['p_surconso']:.0%}""" if mc else ""), height=200)
 
-st.markdown('<div class="footer">GEN-CONTROL V2.5 © DI-SOLUTIONS</div>', unsafe_allow_html=True)
\ No newline at end of file
+st.markdown('<div class="footer">GEN-CONTROL V2.5 © DI-SOLUTIONS</div>', unsafe_allow_html=True)
+tracing.record("gen_control.rerun", (time.perf_counter() - _rerun_t0) * 1000)
\ No newline at end of file
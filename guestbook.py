@@ -1,11 +1,18 @@
 import streamlit as st
 from streamlit_gsheets import GSheetsConnection
-import pandas as pd
 from datetime import datetime
+import time
+
+import assets
+import storage
+import tracing
+from log_writer import DurableLogWriter
+from wall import MessageWall, render_card
 
 # ==========================================
 # 1. CONFIGURATION & DESIGN FESTIF
 # ==========================================
+_rerun_t0 = time.perf_counter()
 st.set_page_config(
     page_title="LIVRE D'OR GIM", 
     page_icon="✍️", 
@@ -69,27 +76,91 @@ st.markdown("""
 # ==========================================
 # 2. CONNEXION GOOGLE SHEETS
 # ==========================================
+# Instrumentation : section [tracing] des secrets (sample_rate, sink), voir tracing.py
+@st.cache_resource
+def init_tracing():
+    tracing.configure(**st.secrets.get("tracing", {}))
+
+# Backend choisi par la section [storage] des secrets (Google Sheets par défaut, voir storage.py)
+@st.cache_resource
+def get_storage():
+    return storage.from_config(st.secrets.get("storage", {}), lambda: st.connection("gsheets", type=GSheetsConnection))
+
+# Mur partagé entre sessions : instantané + high-water mark (voir wall.py)
+WALL_PAGE_SIZE = 20
+
+@st.cache_resource
+def get_wall():
+    return MessageWall(get_storage())
+
+# Signatures : file locale sur disque, acquittée tout de suite, puis écrite par lots
+# par un seul thread (retentes avec délai exponentiel sur les erreurs de quota)
+GUESTBOOK_SPOOL = "guestbook_spool.db"
+
+@st.cache_resource
+def get_submissions():
+    return DurableLogWriter(lambda rows: get_storage().append("guestbook", rows), GUESTBOOK_SPOOL,
+                            batch_size=50, flush_interval=1.0)
+
+# Ressources statiques : produites une fois par processus, servies en octets depuis la mémoire
+LOGO_SIDEBAR_PX = 240
+LOGO_HEADER_PX = 160
+QR_PX = 200
+
+@st.cache_resource
+def get_logo(width):
+    return assets.resized_image("logo_gim.jpg", width)
+
+@st.cache_resource
+def get_qr(url):
+    return assets.qr_png(url, QR_PX) or assets.qr_url(url, QR_PX)
+
+# Mode "écran mur" pour la projection (URL ?mode=mur) : pas de formulaire,
+# seul le mur se ré-exécute toutes les KIOSK_REFRESH secondes
+KIOSK_MODE = st.query_params.get("mode") == "mur"
+KIOSK_REFRESH = 5
+
 try:
-    conn = st.connection("gsheets", type=GSheetsConnection)
+    init_tracing()
+    db = get_storage()
 except Exception as e:
     st.error("⚠️ Erreur de connexion au Livre d'Or. Vérifiez Internet.")
     st.stop()
 
+# Monitoring (URL ?mode=stats, codes de la section [admin] des secrets) : code saisi dans
+# un champ mot de passe, jamais dans l'URL ; accès gardé pour la session
+if st.query_params.get("mode") == "stats":
+    if not st.session_state.get('admin_ok'):
+        with st.form("admin_form"):
+            code = st.text_input("Code administrateur", type="password")
+            if st.form_submit_button("ACCÉDER"):
+                if code in st.secrets.get("admin", {}).get("codes", []):
+                    st.session_state.admin_ok = True
+                    st.rerun()
+                else:
+                    st.error("Accès refusé.")
+        st.stop()
+    st.markdown("### 📊 MONITORING")
+    st.dataframe(tracing.snapshot(), use_container_width=True, hide_index=True)
+    st.json(get_submissions().stats())
+    st.json(db.stats())
+    st.dataframe(db.io_stats(), use_container_width=True, hide_index=True)
+    st.stop()
+
 # ==========================================
 # 3. SIDEBAR (QR CODE AUTOMATIQUE)
 # ==========================================
 with st.sidebar:
-    st.image("logo_gim.jpg", use_column_width=True)
+    st.image(get_logo(LOGO_SIDEBAR_PX))
     st.markdown("### 📱 SCANNEZ-MOI")
     st.info("Invitez les autres parrains à signer le livre d'or en scannant ce code.")
     
     # ASTUCE : Génération automatique du QR Code de la page actuelle
-    # On utilise l'API gratuite qrserver.com
+    # Généré localement une seule fois (librairie qrcode), repli sur l'API qrserver.com
     # Note : Une fois déployé, copiez l'URL de votre app ci-dessous
     APP_URL = "https://gim-guestbook.streamlit.app" # <-- METTEZ VOTRE VRAI LIEN ICI SI CONNU
     
-    qr_code_url = f"https://api.qrserver.com/v1/create-qr-code/?size=200x200&data={APP_URL}"
-    st.image(qr_code_url, caption="Accès Direct")
+    st.image(get_qr(APP_URL), caption="Accès Direct")
 
 # ==========================================
 # 4. HEADER AVEC LOGO LOCAL
@@ -97,7 +168,7 @@ with st.sidebar:
 c1, c2, c3 = st.columns([3, 2, 3])
 with c2:
     try:
-        st.image("logo_gim.jpg", use_column_width=True)
+        st.image(get_logo(LOGO_HEADER_PX))
     except:
         pass # Fallback silencieux
 
@@ -107,36 +178,33 @@ st.markdown("<p class='subtitle'>CÉRÉMONIE DE PARRAINAGE GIM 2025</p>", unsafe
 # ==========================================
 # 5. FORMULAIRE DE SIGNATURE
 # ==========================================
-with st.expander("✍️ LAISSER UN MESSAGE (Cliquer ici)", expanded=True):
-    with st.form("guestbook_form", clear_on_submit=True):
-        c1, c2 = st.columns(2)
-        with c1:
-            nom = st.text_input("Votre Nom *")
-            promo = st.text_input("Promo (Ex: 2010)")
-        with c2:
-            entreprise = st.text_input("Entreprise / Poste *")
+if not KIOSK_MODE:
+    with st.expander("✍️ LAISSER UN MESSAGE (Cliquer ici)", expanded=True):
+        with st.form("guestbook_form", clear_on_submit=True):
+            c1, c2 = st.columns(2)
+            with c1:
+                nom = st.text_input("Votre Nom *")
+                promo = st.text_input("Promo (Ex: 2010)")
+            with c2:
+                entreprise = st.text_input("Entreprise / Poste *")
         
-        message = st.text_area("Votre message pour les étudiants / Le département *", placeholder="Félicitations aux filleuls...")
+            message = st.text_area("Votre message pour les étudiants / Le département *", placeholder="Félicitations aux filleuls...")
         
-        if st.form_submit_button("PUBLIER MON MESSAGE 🚀"):
-            if nom and entreprise and message:
-                try:
-                    df = conn.read(worksheet="guestbook", ttl=0)
-                    new_row = pd.DataFrame([{
-                        "date": datetime.now().strftime("%H:%M"),
-                        "nom": nom,
-                        "promo": promo,
-                        "entreprise": entreprise,
-                        "message": message
-                    }])
-                    updated_df = pd.concat([df, new_row], ignore_index=True)
-                    conn.update(worksheet="guestbook", data=updated_df)
-                    st.success("Merci ! Votre message est affiché sur le mur.")
-                    st.rerun()
-                except Exception as e:
-                    st.error(f"Erreur d'enregistrement : {e}")
-            else:
-                st.warning("Veuillez remplir le Nom, l'Entreprise et le Message.")
+            if st.form_submit_button("PUBLIER MON MESSAGE 🚀"):
+                if nom and entreprise and message:
+                    try:
+                        row = [datetime.now().strftime("%H:%M"), nom, promo, entreprise, message]
+                        with tracing.span("guestbook.submit"):
+                            get_submissions().submit(row)
+                        # Affiché tout de suite pour son auteur, le temps que la file l'écrive dans la feuille
+                        st.session_state.setdefault('my_messages', []).append(
+                            (len(get_wall()), dict(zip(storage.SCHEMA["guestbook"], row))))
+                        st.success("Merci ! Votre message est affiché sur le mur.")
+                        st.rerun()
+                    except Exception as e:
+                        st.error(f"Erreur d'enregistrement : {e}")
+                else:
+                    st.warning("Veuillez remplir le Nom, l'Entreprise et le Message.")
 
 # ==========================================
 # 6. MUR DES MESSAGES (DISPLAY)
@@ -144,27 +212,85 @@ with st.expander("✍️ LAISSER UN MESSAGE (Cliquer ici)", expanded=True):
 st.markdown("---")
 st.markdown("<h3 style='text-align: center; color: #003366;'>💬 ILS SONT LÀ AUJOURD'HUI...</h3>", unsafe_allow_html=True)
 
-if st.button("🔄 Actualiser le mur"):
-    st.rerun()
+if 'wall_pages' not in st.session_state:
+    st.session_state.wall_pages = 1
 
-try:
-    df_display = conn.read(worksheet="guestbook", ttl=0)
-    if not df_display.empty:
-        for index, row in df_display.iloc[::-1].iterrows():
-            promo_txt = f" | Promo {row['promo']}" if pd.notna(row['promo']) and row['promo'] != "" else ""
-            st.markdown(f"""
-            <div class="message-card">
-                <div class="author">{row['nom']} <span style="color:#FF6600;">{promo_txt}</span></div>
-                <div class="meta">🏢 {row['entreprise']} • 🕒 {row['date']}</div>
-                <div class="msg-text">“ {row['message']} ”</div>
-            </div>
-            """, unsafe_allow_html=True)
-    else:
-        st.info("Soyez le premier à écrire un message !")
-except Exception:
-    st.info("Chargement des messages...")
+def voir_plus():
+    st.session_state.wall_pages += 1
+
+def facet_select(label, facet, wall, docs, key):
+    """Filtre de facette : valeurs présentes dans les résultats de la recherche, avec leur nombre."""
+    counts = wall.index.facet_counts(facet, docs)
+    options = [""] + [k for k, _, _ in counts]
+    labels = {k: f"{lbl} ({n})" for k, lbl, n in counts}
+    # Les options changent avec la recherche (nouveau widget) : choix gardé à part
+    current = st.session_state.get(key, "")
+    if current not in options:
+        current = ""
+    st.session_state[key] = st.selectbox(label, options, index=options.index(current),
+                                         format_func=lambda k: labels.get(k, "Toutes"))
+    return st.session_state[key]
+
+def render_search(wall):
+    """Recherche pour les organisateurs (nom, promo, entreprise, message) ; True si active."""
+    recherche = st.text_input("🔎 Rechercher un message", placeholder="Nom, promo, entreprise, mot du message...",
+                              key="wall_query")
+    with tracing.span("guestbook.search"):
+        # Facettes comptées sur les résultats de la recherche texte ; sans texte, comptes tenus
+        # à jour par l'index (pas de parcours des N messages à chaque rerun)
+        docs = wall.index.search(recherche) if recherche.strip() else None
+        f1, f2 = st.columns(2)
+        with f1:
+            promo = facet_select("Promo", "promo", wall, docs, "wall_promo")
+        with f2:
+            entreprise = facet_select("Entreprise", "entreprise", wall, docs, "wall_entreprise")
+        if not (recherche.strip() or promo or entreprise):
+            return False
+        cards, found = wall.search(recherche, {"promo": promo, "entreprise": entreprise},
+                                   WALL_PAGE_SIZE * st.session_state.wall_pages)
+    st.caption(f"{len(found)} message(s) trouvé(s)")
+    if cards:
+        st.markdown("".join(cards), unsafe_allow_html=True)
+    if len(cards) < len(found):
+        st.button(f"⬇️ Voir plus ({len(found) - len(cards)} messages)", on_click=voir_plus)
+    return True
+
+def own_pending_cards(wall):
+    """Cartes des messages de la session pas encore relus dans la feuille (plus récent d'abord)."""
+    pending = [(since, row) for since, row in st.session_state.get('my_messages', [])
+               if not any(str(r.get("nom")) == row["nom"] and str(r.get("message")) == row["message"]
+                          for r in wall.rows[since:])]
+    st.session_state.my_messages = pending
+    return [render_card(row) for _, row in reversed(pending)]
+
+def render_wall():
+    actualiser = False if KIOSK_MODE else st.button("🔄 Actualiser le mur")
+    try:
+        wall = get_wall()
+        # Lecture des seules nouvelles lignes, partagée et limitée entre toutes les sessions
+        with tracing.span("guestbook.wall_refresh"):
+            wall.refresh(force=actualiser)
+        mine = own_pending_cards(wall)
+        # Index inversé tenu à jour par le mur : pas de filtrage du DataFrame à chaque frappe
+        if not KIOSK_MODE and len(wall) and render_search(wall):
+            return
+        if len(wall) or mine:
+            # Du plus récent au plus ancien, par pages de WALL_PAGE_SIZE ("Voir plus")
+            with tracing.span("guestbook.wall_render"):
+                cards = wall.page(WALL_PAGE_SIZE * st.session_state.wall_pages)
+                st.markdown("".join(mine + cards), unsafe_allow_html=True)
+            if not KIOSK_MODE and len(cards) < len(wall):
+                st.button(f"⬇️ Voir plus ({len(wall) - len(cards)} messages)", on_click=voir_plus)
+        else:
+            st.info("Soyez le premier à écrire un message !")
+    except Exception:
+        st.info("Chargement des messages...")
+
+# Fragment : le rafraîchissement ne ré-exécute ni l'en-tête ni le formulaire
+st.fragment(run_every=KIOSK_REFRESH if KIOSK_MODE else None)(render_wall)()
 
 # ==========================================
 # 7. FOOTER
 # ==========================================
-st.markdown("<div style='text-align: center; margin-top: 50px; border-top: 1px solid #eee; padding-top: 20px; font-size: 0.8em; color: #888;'>Digital Guestbook by DI-SOLUTIONS</div>", unsafe_allow_html=True)
\ No newline at end of file
+st.markdown("<div style='text-align: center; margin-top: 50px; border-top: 1px solid #eee; padding-top: 20px; font-size: 0.8em; color: #888;'>Digital Guestbook by DI-SOLUTIONS</div>", unsafe_allow_html=True)
+tracing.record("guestbook.rerun", (time.perf_counter() - _rerun_t0) * 1000)
\ No newline at end of file
@@ -0,0 +1,117 @@
+# ==============================================================================
+# GEN-CONTROL - ANNUAIRE DES LICENCES (INDEX EN MÉMOIRE + TTL)
+# Index dict code -> {statut, client_nom, machine_lock}, rafraîchi en tâche de fond.
+# ==============================================================================
+import threading
+import time
+
+import pandas as pd
+
+
+def normalize_code(code):
+    return str(code).strip()
+
+
+def _clean(value):
+    if value is None or pd.isna(value) or str(value).strip() == "":
+        return None
+    return str(value).strip()
+
+
+class LicenseDirectory:
+    """Annuaire partagé entre sessions. `load_fn()` retourne la feuille `users` (DataFrame).
+
+    Une entrée n'est jamais servie plus de `ttl` secondes après son chargement :
+    au-delà, `lookup` recharge de façon synchrone. Le thread de fond recharge avant
+    l'échéance pour que le cas courant ne fasse aucun aller-retour réseau.
+    `version_fn()` (optionnel) : version partagée de la feuille ; si elle change (écriture
+    depuis un autre processus), l'index est reconstruit au prochain accès.
+    """
+
+    def __init__(self, load_fn, ttl=60.0, background=True, version_fn=None):
+        self.load_fn = load_fn
+        self.ttl = float(ttl)
+        self.version_fn = version_fn
+        self._index = {}
+        self._loaded_at = None
+        self._version = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.stats = {"hits": 0, "reloads": 0, "errors": 0}
+        if background:
+            threading.Thread(target=self._refresh_loop, name="license-refresh", daemon=True).start()
+
+    # --- API publique ---
+    def lookup(self, code):
+        """Retourne l'entrée de la licence (dict) ou None si le code est inconnu."""
+        if self._expired():
+            self.reload(force=False)
+        self.stats["hits"] += 1
+        return self._index.get(normalize_code(code))
+
+    def reload(self, force=True):
+        with self._lock:
+            # Un autre thread vient peut-être de recharger pendant qu'on attendait le verrou
+            if not force and not self._expired():
+                return
+            try:
+                # Version relevée avant la lecture : une écriture pendant le chargement relancera un rechargement
+                version = self._current_version()
+                df = self.load_fn()
+            except Exception:
+                # Feuille injoignable : l'appelant refuse plutôt que de servir un index périmé
+                self.stats["errors"] += 1
+                raise
+            self._index = self._build_index(df)
+            self._loaded_at = time.monotonic()
+            self._version = version
+            self.stats["reloads"] += 1
+
+    def invalidate(self):
+        """Force un rechargement au prochain accès (à appeler après une écriture dans `users`)."""
+        self._loaded_at = None
+
+    def update(self, code, **fields):
+        """Répercute localement une écriture déjà faite dans la feuille."""
+        entry = self._index.get(normalize_code(code))
+        if entry is not None:
+            self._index[normalize_code(code)] = {**entry, **fields}
+
+    def close(self):
+        self._stop.set()
+
+    # --- Interne ---
+    def _current_version(self):
+        try:
+            return self.version_fn() if self.version_fn else None
+        except Exception:
+            return None
+
+    def _expired(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl:
+            return True
+        return self.version_fn is not None and self._current_version() != self._version
+
+    @staticmethod
+    def _build_index(df):
+        index = {}
+        for row in df.to_dict("records"):
+            code = normalize_code(row.get("code_acces", ""))
+            if not code or code == "nan":
+                continue
+            entry = {
+                "statut": _clean(row.get("statut")),
+                "client_nom": row.get("client_nom"),
+                "machine_lock": _clean(row.get("machine_lock")),
+            }
+            # En cas de doublon, la ligne ACTIF l'emporte (comme le filtre d'origine)
+            if code not in index or (entry["statut"] == "ACTIF" and index[code]["statut"] != "ACTIF"):
+                index[code] = entry
+        return index
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.ttl * 0.5):
+            try:
+                self.reload()
+            except Exception:
+                pass
@@ -0,0 +1,227 @@
+# ==============================================================================
+# GEN-CONTROL - ÉCRITURE DU JOURNAL EN TÂCHE DE FOND
+# File d'attente (mémoire ou disque) + ajout par lots (append) sur un thread dédié.
+# ==============================================================================
+import atexit
+import collections
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+CLAIM_TTL = 60.0  # secondes avant de reprendre les lignes réservées par un autre processus
+
+
+def is_rate_limited(exc):
+    """Erreur de quota Google (HTTP 429) ?"""
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None) == 429 or "429" in str(exc)
+
+
+class LogWriter:
+    """Accumule les lignes de journal et les envoie par lots via `append_fn(rows)`.
+
+    Un lot n'est retiré de la file qu'après un envoi réussi ; en cas d'échec il est
+    retenté avec un délai exponentiel (plafonné à `max_backoff`).
+    """
+
+    def __init__(self, append_fn, batch_size=20, flush_interval=2.0, max_queue=10000, max_backoff=60.0):
+        self.append_fn = append_fn
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = float(flush_interval)
+        self.max_queue = int(max_queue)
+        self.max_backoff = float(max_backoff)
+
+        self._queue = collections.deque()
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._backoff = 0.0
+        self._rate = collections.deque()  # (seconde, nb de soumissions)
+
+        self._stats = {"submitted": 0, "written": 0, "dropped": 0, "failures": 0, "rate_limited": 0,
+                       "last_flush_ms": 0.0, "max_flush_ms": 0.0, "total_flush_ms": 0.0, "flushes": 0,
+                       "peak_rate": 0}
+        self._open()
+
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # --- API publique ---
+    def submit(self, row):
+        """Ajoute une ligne (liste de valeurs) à la file. Ne bloque jamais l'appelant."""
+        with self._cond:
+            self._push(list(row))
+            self._stats["submitted"] += 1
+            self._count_rate()
+            if self._depth() >= self.batch_size:
+                self._cond.notify()
+
+    def flush(self):
+        """Vide la file de façon synchrone (lots successifs). Retourne False en cas d'échec."""
+        with self._flush_lock:
+            while True:
+                with self._cond:
+                    batch = self._peek(self.batch_size)
+                if not batch:
+                    return True
+                if not self._write(batch):
+                    return False
+
+    def close(self, timeout=10.0):
+        """Arrête le thread et draine ce qui reste dans la file."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        with self._cond:
+            self._cond.notify()
+        self._thread.join(timeout)
+        self.flush()
+
+    def stats(self):
+        now = int(time.time())
+        with self._cond:
+            s = dict(self._stats)
+            s["queue_depth"] = self._depth()
+            recent = sum(n for sec, n in self._rate if sec >= now - 10)
+        s["avg_flush_ms"] = s["total_flush_ms"] / s["flushes"] if s["flushes"] else 0.0
+        s["rate_10s"] = recent / 10.0
+        # Toute ligne acceptée est soit écrite, soit encore en file : le reste est perdu
+        s["lost"] = s["submitted"] + s.get("recovered", 0) - s["written"] - s["dropped"] - s["queue_depth"]
+        return s
+
+    # --- File en mémoire (redéfinie par DurableLogWriter) ---
+    def _open(self):
+        pass
+
+    def _push(self, row):
+        if len(self._queue) >= self.max_queue:
+            # File saturée (backend injoignable) : on sacrifie la plus ancienne
+            self._queue.popleft()
+            self._stats["dropped"] += 1
+        self._seq += 1
+        self._queue.append((self._seq, row))
+
+    def _peek(self, n):
+        return [self._queue[i] for i in range(min(n, len(self._queue)))]
+
+    def _ack(self, last_id):
+        while self._queue and self._queue[0][0] <= last_id:
+            self._queue.popleft()
+
+    def _depth(self):
+        return len(self._queue)
+
+    # --- Interne ---
+    def _count_rate(self):
+        sec = int(time.time())
+        if self._rate and self._rate[-1][0] == sec:
+            self._rate[-1] = (sec, self._rate[-1][1] + 1)
+        else:
+            self._rate.append((sec, 1))
+            while self._rate[0][0] < sec - 60:
+                self._rate.popleft()
+        self._stats["peak_rate"] = max(self._stats["peak_rate"], self._rate[-1][1])
+
+    def _write(self, batch):
+        t0 = time.perf_counter()
+        try:
+            self.append_fn([row for _, row in batch])
+        except Exception as e:
+            with self._cond:
+                self._stats["failures"] += 1
+                if is_rate_limited(e):
+                    self._stats["rate_limited"] += 1
+            self._backoff = min(self.max_backoff, max(self.flush_interval, self._backoff * 2))
+            return False
+        ms = (time.perf_counter() - t0) * 1000
+        self._backoff = 0.0
+        with self._cond:
+            self._ack(batch[-1][0])
+            self._stats["written"] += len(batch)
+            self._stats["flushes"] += 1
+            self._stats["last_flush_ms"] = ms
+            self._stats["total_flush_ms"] += ms
+            self._stats["max_flush_ms"] = max(self._stats["max_flush_ms"], ms)
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._cond:
+                if self._depth() < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+            if self._stop.is_set():
+                break
+            if not self.flush():
+                # Délai exponentiel avec gigue : les workers ne retentent pas tous en même temps
+                self._stop.wait(self._backoff * random.uniform(0.5, 1.0))
+
+
+class DurableLogWriter(LogWriter):
+    """Variante dont la file est un fichier SQLite : une ligne acceptée survit à un
+    redémarrage du processus et est renvoyée au démarrage suivant.
+
+    Le fichier peut être partagé par plusieurs processus (plusieurs serveurs Streamlit sur
+    la même machine) : chaque lot est réservé par un seul écrivain, et les réservations
+    d'un processus disparu sont reprises après `claim_ttl` secondes."""
+
+    def __init__(self, append_fn, spool_path, claim_ttl=CLAIM_TTL, **kwargs):
+        self.spool_path = spool_path
+        self.claim_ttl = float(claim_ttl)
+        super().__init__(append_fn, **kwargs)
+
+    def _open(self):
+        self._owner = f"{os.getpid()}:{id(self)}"
+        self._db = sqlite3.connect(self.spool_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS spool (id INTEGER PRIMARY KEY AUTOINCREMENT, row TEXT, "
+                         "owner TEXT, claimed_at REAL)")
+        cols = {r[1] for r in self._db.execute("PRAGMA table_info(spool)")}
+        if "owner" not in cols:  # file créée par une version précédente
+            self._db.execute("ALTER TABLE spool ADD COLUMN owner TEXT")
+            self._db.execute("ALTER TABLE spool ADD COLUMN claimed_at REAL")
+        # Compteurs du fichier, tous processus confondus (bilan "lost" de stats())
+        self._db.execute("CREATE TABLE IF NOT EXISTS totals (key TEXT PRIMARY KEY, value INTEGER)")
+        with self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.execute("INSERT OR IGNORE INTO totals VALUES ('submitted', (SELECT COUNT(*) FROM spool)), "
+                             "('written', 0)")
+        self._stats["recovered"] = self._depth()
+
+    def _push(self, row):
+        with self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.execute("INSERT INTO spool (row) VALUES (?)", (json.dumps(row, default=str),))
+            self._db.execute("UPDATE totals SET value = value + 1 WHERE key = 'submitted'")
+
+    def _peek(self, n):
+        # Réserve (ou renouvelle) un lot : libre, déjà à nous, ou abandonné par un autre processus
+        now = time.time()
+        with self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            rows = self._db.execute("SELECT id, row FROM spool WHERE owner IS NULL OR owner = ? OR claimed_at < ? "
+                                    "ORDER BY id LIMIT ?", (self._owner, now - self.claim_ttl, n)).fetchall()
+            self._db.executemany("UPDATE spool SET owner = ?, claimed_at = ? WHERE id = ?",
+                                 [(self._owner, now, i) for i, _ in rows])
+        return [(i, json.loads(r)) for i, r in rows]
+
+    def _ack(self, last_id):
+        with self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            n = self._db.execute("DELETE FROM spool WHERE owner = ? AND id <= ?", (self._owner, last_id)).rowcount
+            self._db.execute("UPDATE totals SET value = value + ? WHERE key = 'written'", (n,))
+
+    def _depth(self):
+        return self._db.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+
+    def stats(self):
+        s = super().stats()
+        # File partagée : les compteurs du processus mêlent les lignes des autres ; bilan sur le fichier
+        with self._cond:
+            totals = dict(self._db.execute("SELECT key, value FROM totals"))
+        s["lost"] = totals["submitted"] - totals["written"] - s["queue_depth"]
+        return s
@@ -0,0 +1,90 @@
+# ==============================================================================
+# GEN-CONTROL - REGISTRE DES PROFILS MATÉRIEL
+# Classes moteur (CSP, friction), profils groupe, trajets camion et accessoires PTO
+# lus depuis profiles.json puis compilés en tables indexées par identifiant.
+# ==============================================================================
+import json
+import os
+
+PROFILES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles.json")
+VERSION = 1  # version de format comprise par ce module
+
+# Écarts-types relatifs du mode confiance (Monte Carlo), surchargés par la section "incertitudes"
+INCERTITUDES = {"charge_scenario": 0.20, "charge_mesure": 0.05, "charge_pto": 0.25, "csp": 0.08, "heures": 0.05}
+
+# Champs obligatoires par table
+_FIELDS = {
+    "classes": ("id", "type", "label", "unite", "kw_par_unite", "min", "max", "defaut", "csp", "friction"),
+    "profils_groupe": ("id", "label", "charge"),
+    "trajets": ("id", "label", "charge"),
+    "pto": ("id", "label", "kw"),
+}
+
+# Types de classe (écran d'audit : profils groupe + ampèremètre, ou trajets + PTO) et leurs champs en plus
+TYPES = {
+    "groupe": ("amperes_par_unite",),
+    "vehicule": (),
+}
+
+
+class Table:
+    """Entrées ordonnées d'une section : `ids` pour les sélecteurs, accès O(1) par id."""
+
+    def __init__(self, name, entries):
+        self.name = name
+        self.ids = tuple(e["id"] for e in entries)
+        self._by_id = {e["id"]: e for e in entries}
+        if len(self._by_id) != len(self.ids):
+            raise ValueError(f"profiles: identifiant en double dans '{name}'")
+
+    def __getitem__(self, key):
+        return self._by_id[key]
+
+    def __contains__(self, key):
+        return key in self._by_id
+
+    def __len__(self):
+        return len(self.ids)
+
+    def label(self, key):
+        return self._by_id[key]["label"]
+
+
+class Registry:
+    def __init__(self, data):
+        if data.get("version") != VERSION:
+            raise ValueError(f"profiles: version {data.get('version')} non supportée (attendu {VERSION})")
+        for name, fields in _FIELDS.items():
+            for entry in data.get(name, []):
+                missing = [f for f in fields if f not in entry]
+                if missing:
+                    raise ValueError(f"profiles: {name}/{entry.get('id')} sans {', '.join(missing)}")
+        for entry in data.get("classes", []):
+            if entry["type"] not in TYPES:
+                raise ValueError(f"profiles: classes/{entry['id']} de type inconnu '{entry['type']}' "
+                                 f"(attendu {', '.join(TYPES)})")
+            missing = [f for f in TYPES[entry["type"]] if f not in entry]
+            if missing:
+                raise ValueError(f"profiles: classes/{entry['id']} ({entry['type']}) sans {', '.join(missing)}")
+        self.version = data["version"]
+        self.classes = Table("classes", data["classes"])
+        self.profils_groupe = Table("profils_groupe", data["profils_groupe"])
+        self.trajets = Table("trajets", data["trajets"])
+        self.pto = Table("pto", data["pto"])
+        self.marge_pto = float(data.get("marge_pto", 0.0))
+        self.incertitudes = {**INCERTITUDES, **data.get("incertitudes", {})}
+
+    def puissance_kw(self, classe, valeur):
+        """Puissance nominale (kW) à partir de la saisie dans l'unité de la classe."""
+        return valeur * self.classes[classe]["kw_par_unite"]
+
+    def charge_pto(self, accessoire, p_max_kw):
+        """Facteur de charge du moteur principal quand seul l'accessoire tourne."""
+        if p_max_kw <= 0:
+            return 0.0
+        return self.pto[accessoire]["kw"] / p_max_kw + self.marge_pto
+
+
+def load(path=PROFILES_FILE):
+    with open(path, encoding="utf-8") as f:
+        return Registry(json.load(f))
@@ -0,0 +1,150 @@
+# ==============================================================================
+# GEN-CONTROL - ORDONNANCEUR DES ACCÈS GOOGLE SHEETS
+# Lectures identiques simultanées fusionnées (single-flight), écritures limitées
+# par un seau à jetons calé sur le quota, retentes exponentielles sur HTTP 429.
+# ==============================================================================
+import collections
+import random
+import threading
+import time
+
+from log_writer import is_rate_limited
+
+
+class _Flight:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Pendant qu'un appel `key` est en cours, les appels identiques attendent son résultat."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def do(self, key, fn):
+        """Retourne (résultat, partagé ?)."""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            result = flight.result
+            # Chaque appelant reçoit sa propre copie (DataFrame modifiable)
+            return (result.copy() if hasattr(result, "copy") else result), True
+        try:
+            flight.result = fn()
+            return flight.result, False
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.event.set()
+
+
+class TokenBucket:
+    def __init__(self, per_minute, burst=None):
+        self.rate = per_minute / 60.0
+        self.capacity = float(burst if burst is not None else max(1, per_minute // 6))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Bloque jusqu'à obtenir un jeton ; retourne le temps d'attente (s)."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class IOScheduler:
+    """Point de passage unique des appels Google Sheets d'un processus.
+
+    `write_quota` / `read_quota` : requêtes par minute (quota Google par défaut : 60 / utilisateur).
+    """
+
+    def __init__(self, write_quota=60, read_quota=60, max_retries=5, base_delay=1.0, max_delay=32.0):
+        self.read_quota = read_quota
+        self.write_quota = write_quota
+        self.writes = TokenBucket(write_quota)
+        self.flights = SingleFlight()
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._stats = collections.defaultdict(lambda: collections.Counter())
+        self._recent = collections.defaultdict(collections.deque)  # (feuille, type) -> instants
+
+    def read(self, worksheet, key, fn):
+        """Lecture fusionnée avec les lectures identiques en cours."""
+        result, shared = self.flights.do((worksheet,) + tuple(key), lambda: self._retry(worksheet, "read", fn))
+        self._count(worksheet, "reads_shared" if shared else "reads")
+        return result
+
+    def write(self, worksheet, fn):
+        """Écriture soumise au seau à jetons."""
+        waited = self.writes.acquire()
+        self._count(worksheet, "throttled_ms", int(waited * 1000))
+        result = self._retry(worksheet, "write", fn)
+        self._count(worksheet, "writes")
+        return result
+
+    def _retry(self, worksheet, kind, fn):
+        for attempt in range(self.max_retries + 1):
+            self._mark(worksheet, kind)
+            try:
+                return fn()
+            except Exception as e:
+                if not is_rate_limited(e) or attempt == self.max_retries:
+                    self._count(worksheet, "errors")
+                    raise
+                self._count(worksheet, "rate_limited")
+                # Délai exponentiel, gigue "pleine" pour désynchroniser les sessions
+                time.sleep(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+
+    def _count(self, worksheet, name, n=1):
+        with self._lock:
+            self._stats[worksheet][name] += n
+
+    def _mark(self, worksheet, kind):
+        now = time.monotonic()
+        with self._lock:
+            q = self._recent[(worksheet, kind)]
+            q.append(now)
+            while q[0] < now - 60:
+                q.popleft()
+
+    def stats(self):
+        """Une ligne par feuille : volumes cumulés et consommation du quota sur la dernière minute."""
+        now = time.monotonic()
+        rows = []
+        with self._lock:
+            for ws in sorted(set(self._stats) | {w for w, _ in self._recent}):
+                per_min = {k: sum(1 for t in self._recent.get((ws, k), ()) if t >= now - 60) for k in ("read", "write")}
+                rows.append({
+                    "feuille": ws, **dict(self._stats[ws]),
+                    "reads_per_min": per_min["read"], "writes_per_min": per_min["write"],
+                    "read_quota_pct": round(100 * per_min["read"] / self.read_quota, 1),
+                    "write_quota_pct": round(100 * per_min["write"] / self.write_quota, 1),
+                })
+        return rows
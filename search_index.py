@@ -0,0 +1,120 @@
+# ==============================================================================
+# LIVRE D'OR - INDEX DE RECHERCHE PLEIN TEXTE (EN MÉMOIRE, INCRÉMENTAL)
+# Index inversé insensible aux accents et à la casse, alimenté ligne par ligne par
+# le mur ; facettes (promo, entreprise) comptées sur le résultat courant.
+# ==============================================================================
+import bisect
+import re
+import threading
+import unicodedata
+
+import pandas as pd
+
+FIELDS = ["nom", "promo", "entreprise", "message"]
+FACETS = ["promo", "entreprise"]
+MIN_PREFIX = 2  # dernier mot tapé : recherché comme préfixe à partir de 2 caractères
+
+_WORD = re.compile(r"[^\W_]+")
+_MARKS = re.compile(r"[\u0300-\u036f]")  # diacritiques combinants (après décomposition NFKD)
+
+
+def normalize(value):
+    """Minuscules sans accents ("Élève" -> "eleve")."""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    text = str(value).casefold()
+    if text.isascii():
+        return text
+    return _MARKS.sub("", unicodedata.normalize("NFKD", text))
+
+
+def tokenize(value):
+    return _WORD.findall(normalize(value))
+
+
+class SearchIndex:
+    """Documents numérotés dans l'ordre d'arrivée (rang dans le mur). `add()` coûte le
+    nombre de mots de la ligne ; `search()` intersecte des listes de rangs."""
+
+    def __init__(self, fields=FIELDS, facets=FACETS):
+        self.fields = fields
+        self.facets = facets
+        self._postings = {}     # mot -> rangs (croissants)
+        self._vocab = []        # mots triés, pour la recherche par préfixe
+        self._facet_docs = {f: {} for f in facets}   # facette -> clé normalisée -> rangs
+        self._facet_labels = {f: {} for f in facets}  # facette -> clé -> libellé affiché
+        self._doc_facets = []   # rang -> {facette: clé}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._doc_facets)
+
+    def add(self, row):
+        """Indexe une ligne (dict) ; retourne son rang."""
+        with self._lock:
+            doc = len(self._doc_facets)
+            words = set()
+            for field in self.fields:
+                words.update(tokenize(row.get(field)))
+            for word in words:
+                postings = self._postings.get(word)
+                if postings is None:
+                    self._postings[word] = [doc]
+                    bisect.insort(self._vocab, word)
+                else:
+                    postings.append(doc)
+            keys = {}
+            for facet in self.facets:
+                label = "" if row.get(facet) is None or pd.isna(row.get(facet)) else str(row.get(facet)).strip()
+                key = " ".join(tokenize(label))
+                if key:
+                    self._facet_docs[facet].setdefault(key, []).append(doc)
+                    self._facet_labels[facet].setdefault(key, label)
+                    keys[facet] = key
+            self._doc_facets.append(keys)
+            return doc
+
+    def _matching(self, word, prefix):
+        if not prefix:
+            return set(self._postings.get(word, ()))
+        docs = set()
+        i = bisect.bisect_left(self._vocab, word)
+        while i < len(self._vocab) and self._vocab[i].startswith(word):
+            docs.update(self._postings[self._vocab[i]])
+            i += 1
+        return docs
+
+    def search(self, query="", filters=None):
+        """Rangs des lignes contenant tous les mots de `query` (le dernier comme préfixe)
+        et correspondant aux `filters` {facette: clé}, du plus récent au plus ancien."""
+        words = tokenize(query)
+        with self._lock:
+            result = None
+            for i, word in enumerate(words):
+                # Mot en cours de frappe (pas d'espace après) : préfixe
+                prefix = i == len(words) - 1 and len(word) >= MIN_PREFIX and query == query.rstrip()
+                docs = self._matching(word, prefix)
+                result = docs if result is None else result & docs
+                if not result:
+                    return []
+            for facet, key in (filters or {}).items():
+                if key:
+                    docs = set(self._facet_docs[facet].get(key, ()))
+                    result = docs if result is None else result & docs
+            if result is None:
+                return list(range(len(self._doc_facets) - 1, -1, -1))
+            return sorted(result, reverse=True)
+
+    def facet_counts(self, facet, docs=None):
+        """[(clé, libellé, nombre)] de la facette sur `docs` (tout l'index par défaut), par nombre décroissant."""
+        with self._lock:
+            if docs is None:
+                counts = {k: len(v) for k, v in self._facet_docs[facet].items()}
+            else:
+                counts = {}
+                for doc in docs:
+                    key = self._doc_facets[doc].get(facet)
+                    if key:
+                        counts[key] = counts.get(key, 0) + 1
+            labels = self._facet_labels[facet]
+            return sorted(((k, labels[k], n) for k, n in counts.items()), key=lambda t: (-t[2], t[1]))
@@ -0,0 +1,228 @@
+# ==============================================================================
+# GEN-CONTROL - CACHE PARTAGÉ ENTRE PROCESSUS (PLUSIEURS SERVEURS STREAMLIT)
+# Instantanés de feuilles versionnés : une écriture incrémente la version de la
+# feuille, tous les processus relisent au prochain accès (une seule lecture Google
+# pour tout le groupe). Fichier SQLite local ou serveur compatible Redis.
+# Valeurs stockées en Parquet (DataFrame) : rien d'exécutable, même si le serveur est partagé.
+# ==============================================================================
+import collections
+import io
+import sqlite3
+import struct
+import threading
+import time
+
+import pandas as pd
+
+from scheduler import SingleFlight
+
+try:
+    import redis
+except ImportError:  # Optionnel : seulement pour backend = "redis"
+    redis = None
+
+TTL = 300.0          # durée de vie d'un instantané sans écriture (modifs faites à la main dans la feuille)
+LEASE = 10.0         # un seul processus charge une version manquante ; les autres l'attendent au plus LEASE s
+POLL = 0.05
+FORMAT = 3          # format des entrées (échéance + Parquet) ; fait partie de la clé
+
+
+class FileBackend:
+    """Clés / valeurs dans un fichier SQLite (WAL) partagé par les processus d'une même machine."""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB, expires REAL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS counters (key TEXT PRIMARY KEY, value INTEGER)")
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT value FROM entries WHERE key = ? AND expires > ?",
+                                   (key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            now = time.time()
+            with self._db:
+                self._db.execute("BEGIN IMMEDIATE")
+                self._db.execute("DELETE FROM entries WHERE expires <= ?", (now,))
+                self._db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?)", (key, value, now + ttl))
+
+    def add(self, key, value, ttl):
+        """Écrit `key` seulement si elle est absente (ou expirée) ; True si écrite."""
+        with self._lock:
+            now = time.time()
+            with self._db:
+                self._db.execute("BEGIN IMMEDIATE")
+                self._db.execute("DELETE FROM entries WHERE key = ? AND expires <= ?", (key, now))
+                cur = self._db.execute("INSERT OR IGNORE INTO entries VALUES (?, ?, ?)", (key, value, now + ttl))
+            return cur.rowcount == 1
+
+    def delete(self, key):
+        with self._lock:
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def counter(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT value FROM counters WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def incr(self, key):
+        with self._lock:
+            with self._db:
+                self._db.execute("BEGIN IMMEDIATE")
+                self._db.execute("INSERT INTO counters VALUES (?, 1) ON CONFLICT(key) DO UPDATE SET value = value + 1",
+                                 (key,))
+                return self._db.execute("SELECT value FROM counters WHERE key = ?", (key,)).fetchone()[0]
+
+
+class RedisBackend:
+    """Même interface sur un serveur Redis (ou compatible : Valkey, KeyDB...), pour plusieurs machines."""
+
+    def __init__(self, url, prefix="gen-control:"):
+        if redis is None:
+            raise RuntimeError("Le backend de cache `redis` demande le paquet `redis`")
+        self._r = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        return self._r.get(self.prefix + key)
+
+    def set(self, key, value, ttl):
+        self._r.set(self.prefix + key, value, px=int(ttl * 1000))
+
+    def add(self, key, value, ttl):
+        return bool(self._r.set(self.prefix + key, value, px=int(ttl * 1000), nx=True))
+
+    def delete(self, key):
+        self._r.delete(self.prefix + key)
+
+    def counter(self, key):
+        return int(self._r.get(self.prefix + "counter:" + key) or 0)
+
+    def incr(self, key):
+        return self._r.incr(self.prefix + "counter:" + key)
+
+
+class SharedCache:
+    """`get(name, loader)` : DataFrame `name` pour sa version courante, chargé par un seul
+    processus à la fois ; `bump(name)` l'invalide pour tous. Si le cache est injoignable,
+    `loader()` est appelé directement (le cache n'est jamais un point de panne)."""
+
+    def __init__(self, backend, ttl=TTL, lease=LEASE):
+        self.backend = backend
+        self.ttl = float(ttl)
+        self.lease = float(lease)
+        self._flight = SingleFlight()
+        self._local = {}   # name -> (clé, valeur, échéance) : évite de désérialiser à chaque accès
+        self._lock = threading.Lock()
+        self._stats = collections.Counter()
+
+    def version(self, name):
+        return self.backend.counter(f"version:{name}")
+
+    def bump(self, name):
+        """Nouvelle version de `name` (après une écriture) ; retourne le numéro."""
+        v = self._safe(self.backend.incr, f"version:{name}")
+        with self._lock:
+            self._local.pop(name, None)
+            self._stats["invalidations"] += 1
+        return v
+
+    def get(self, name, loader, ttl=None, copy=True):
+        """`copy=False` : instantané partagé, à ne pas modifier (l'appelant copie ce qu'il garde)."""
+        version = self._safe(self.version, name)
+        if version is None:
+            return loader()
+        key = f"{name}@{version}#{FORMAT}"
+        with self._lock:
+            local = self._local.get(name)
+        if local is not None and local[0] == key and local[2] > time.monotonic():
+            self._count("local_hits")
+            value = local[1]
+        else:
+            value, _ = self._flight.do(key, lambda: self._fetch(name, key, loader, self.ttl if ttl is None else ttl))
+        return _copy(value) if copy else value
+
+    def _fetch(self, name, key, loader, ttl):
+        deadline = time.monotonic() + self.lease
+        while True:
+            blob = self._safe(self.backend.get, key)
+            entry = self._safe(_decode, blob) if blob is not None else None
+            if entry is not None:
+                self._count("hits")
+                expires, value = entry
+                break
+            # Un seul chargeur par version pour tous les processus (cache injoignable : chacun charge)
+            leased = self._safe(self.backend.add, f"lease:{key}", b"1", self.lease, default=True)
+            if leased or time.monotonic() > deadline:
+                self._count("misses")
+                try:
+                    value = loader()
+                finally:
+                    if leased:
+                        self._safe(self.backend.delete, f"lease:{key}")
+                expires = time.time() + ttl
+                # Valeur non sérialisable en Parquet (types mêlés dans une colonne) : servie sans partage
+                blob = self._safe(_encode, expires, value)
+                if blob is not None:
+                    self._safe(self.backend.set, key, blob, ttl)
+                break
+            self._count("waits")
+            time.sleep(POLL)
+        # La copie locale expire avec l'instantané partagé (âge total borné par `ttl`)
+        with self._lock:
+            self._local[name] = (key, value, time.monotonic() + max(0.0, expires - time.time()))
+        return value
+
+    def _safe(self, fn, *args, default=None):
+        try:
+            return fn(*args)
+        except Exception:
+            self._count("errors")
+            return default
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        with self._lock:
+            s = dict(self._stats)
+        served = s.get("local_hits", 0) + s.get("hits", 0)
+        total = served + s.get("misses", 0)
+        return {**s, "hit_rate": round(served / total, 3) if total else None}
+
+
+def _encode(expires, df):
+    buf = io.BytesIO()
+    df.to_parquet(buf, index=False)
+    return struct.pack("<d", expires) + buf.getvalue()
+
+
+def _decode(blob):
+    """(échéance, DataFrame) ; une entrée illisible lève une exception (traitée comme absente)."""
+    (expires,) = struct.unpack_from("<d", blob)
+    return expires, pd.read_parquet(io.BytesIO(bytes(blob[8:])))
+
+
+def _copy(value):
+    # Chaque appelant reçoit sa propre copie (DataFrame modifiable)
+    return value.copy() if hasattr(value, "copy") else value
+
+
+def from_config(config):
+    """Cache décrit par la section [storage] des secrets (shared_cache = "file" | "redis"), ou None."""
+    kind = config.get("shared_cache")
+    if not kind:
+        return None
+    ttl = float(config.get("shared_cache_ttl", TTL))
+    if kind == "file":
+        return SharedCache(FileBackend(config.get("shared_cache_path", "shared_cache.db")), ttl)
+    if kind == "redis":
+        return SharedCache(RedisBackend(config.get("shared_cache_url", "redis://localhost:6379/0")), ttl)
+    raise ValueError(f"Cache partagé inconnu : {kind}")
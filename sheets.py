@@ -0,0 +1,83 @@
+# ==============================================================================
+# GEN-CONTROL - ACCÈS CIBLÉ AUX FEUILLES GOOGLE (gspread)
+# Ajouts et mises à jour ligne / cellule sans réécrire toute la feuille.
+# ==============================================================================
+import threading
+
+from gspread.utils import rowcol_to_a1
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _lock_for(worksheet):
+    with _locks_guard:
+        return _locks.setdefault(worksheet, threading.Lock())
+
+
+def _is_empty(value):
+    return value is None or str(value).strip() == ""
+
+
+def get_worksheet(conn, worksheet):
+    return conn.client._select_worksheet(worksheet=worksheet)
+
+
+def append_rows(conn, worksheet, rows):
+    get_worksheet(conn, worksheet).append_rows(rows, value_input_option="USER_ENTERED")
+
+
+def find_row(ws, key_col, key):
+    """(numéro de ligne, en-têtes) de la ligne dont `key_col` vaut `key` ; ligne 1 = en-têtes,
+    None si absente. Ne télécharge que l'en-tête et la colonne clé."""
+    header = ws.row_values(1)
+    if key_col not in header:
+        raise KeyError(key_col)
+    values = ws.col_values(header.index(key_col) + 1)
+    key = str(key).strip()
+    for i, v in enumerate(values[1:], start=2):
+        if str(v).strip() == key:
+            return i, header
+    return None, header
+
+
+def rows_from(ws, first_row):
+    """(en-têtes, lignes) à partir de la ligne `first_row` (2 = première ligne de données).
+    Seules les lignes demandées transitent sur le réseau."""
+    header = ws.row_values(1)
+    last_col = rowcol_to_a1(1, max(len(header), 1)).rstrip("0123456789")
+    return header, ws.get_values(f"A{first_row}:{last_col}")
+
+
+def update_row(conn, worksheet, key_col, key, values):
+    """Met à jour les colonnes `values` (dict) de la ligne identifiée par `key`.
+    Retourne False si la clé est introuvable."""
+    ws = get_worksheet(conn, worksheet)
+    with _lock_for(worksheet):
+        row, header = find_row(ws, key_col, key)
+        if row is None:
+            return False
+        ws.batch_update([{"range": rowcol_to_a1(row, header.index(col) + 1), "values": [[val]]}
+                         for col, val in values.items()], value_input_option="USER_ENTERED")
+        return True
+
+
+def update_cell_if_empty(conn, worksheet, key_col, key, col, value):
+    """Compare-and-set : écrit `value` dans la cellule (key, col) seulement si elle est vide.
+
+    Retourne la valeur effective de la cellule après l'opération (la nôtre si l'écriture
+    a eu lieu, celle d'un autre client sinon), ou None si la clé est introuvable.
+    Le verrou sérialise les sessions du processus ; entre processus, la course se limite
+    à l'intervalle lecture/écriture d'une seule cellule et ne touche aucune autre ligne.
+    """
+    ws = get_worksheet(conn, worksheet)
+    with _lock_for(worksheet):
+        row, header = find_row(ws, key_col, key)
+        if row is None:
+            return None
+        col_idx = header.index(col) + 1
+        current = ws.cell(row, col_idx).value
+        if not _is_empty(current):
+            return str(current).strip()
+        ws.update_cell(row, col_idx, value)
+        return str(value).strip()
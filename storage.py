@@ -0,0 +1,469 @@
+# ==============================================================================
+# GEN-CONTROL - COUCHE DE STOCKAGE INTERCHANGEABLE
+# Feuilles `users`, `logs`, `guestbook` : Google Sheets, SQLite (WAL) ou les deux.
+# ==============================================================================
+import collections
+import contextlib
+import queue
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+import shared_cache
+import sheets
+import tracing
+from log_writer import LogWriter
+from scheduler import IOScheduler
+
+# Colonnes de chaque feuille, dans l'ordre des feuilles Google
+SCHEMA = {
+    "users": ["code_acces", "client_nom", "statut", "machine_lock"],
+    "logs": ["date_heure", "code_utilise", "action", "details"],
+    "guestbook": ["date", "nom", "promo", "entreprise", "message"],
+}
+# Durée de vie des instantanés partagés, par feuille (défaut : shared_cache.TTL). `users` :
+# une révocation faite à la main dans la feuille n'incrémente aucune version ; instantané
+# (30 s) + rechargement de fond de l'annuaire (LICENSE_TTL / 2) restent sous LICENSE_TTL.
+SNAPSHOT_TTL = {"users": 30.0}
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_users_code ON users(code_acces)",
+    "CREATE INDEX IF NOT EXISTS idx_logs_date ON logs(date_heure)",
+    "CREATE INDEX IF NOT EXISTS idx_logs_code ON logs(code_utilise, date_heure)",
+]
+
+
+def _is_empty(value):
+    return value is None or (isinstance(value, float) and pd.isna(value)) or str(value).strip() == ""
+
+
+class Storage:
+    """Interface commune. `rows` = listes de valeurs dans l'ordre de SCHEMA[worksheet]."""
+
+    def read(self, worksheet):
+        raise NotImplementedError
+
+    def read_since(self, worksheet, start):
+        """Lignes de données à partir de la position `start` (0 = première ligne après l'en-tête)."""
+        return self.read(worksheet).iloc[start:].reset_index(drop=True)
+
+    def get_row(self, worksheet, key_col, key):
+        raise NotImplementedError
+
+    def append(self, worksheet, rows):
+        raise NotImplementedError
+
+    def update_cell_if_empty(self, worksheet, key_col, key, col, value):
+        raise NotImplementedError
+
+    def version(self, worksheet):
+        """Version partagée de la feuille, changée à chaque écriture (None sans cache partagé)."""
+        return None
+
+    def io_stats(self):
+        """Consommation du quota distant par feuille (vide pour un stockage local)."""
+        return []
+
+    def stats(self):
+        """Compteurs internes du backend (pool de connexions, commits...)."""
+        return {}
+
+    def close(self):
+        pass
+
+
+# ------------------------------------------------------------------------------
+# GOOGLE SHEETS
+# ------------------------------------------------------------------------------
+class SheetsStorage(Storage):
+    """Tous les appels passent par l'ordonnanceur : lectures identiques fusionnées,
+    écritures lissées sous le quota, retentes sur HTTP 429."""
+
+    def __init__(self, conn, scheduler=None):
+        self.conn = conn
+        self.scheduler = scheduler or IOScheduler()
+
+    def read(self, worksheet):
+        return self.scheduler.read(worksheet, ("read",), lambda: self.conn.read(worksheet=worksheet, ttl=0))
+
+    def read_since(self, worksheet, start):
+        def fetch():
+            ws = sheets.get_worksheet(self.conn, worksheet)
+            header, values = sheets.rows_from(ws, start + 2)
+            return pd.DataFrame([v + [""] * (len(header) - len(v)) for v in values], columns=header)
+        return self.scheduler.read(worksheet, ("read_since", start), fetch)
+
+    def get_row(self, worksheet, key_col, key):
+        def fetch():
+            ws = sheets.get_worksheet(self.conn, worksheet)
+            row, header = sheets.find_row(ws, key_col, key)
+            if row is None:
+                return None
+            values = ws.row_values(row)
+            return dict(zip(header, values + [None] * (len(header) - len(values))))
+        return self.scheduler.read(worksheet, ("get_row", key_col, str(key).strip()), fetch)
+
+    def append(self, worksheet, rows):
+        self.scheduler.write(worksheet, lambda: sheets.append_rows(self.conn, worksheet, rows))
+
+    def update_cell_if_empty(self, worksheet, key_col, key, col, value):
+        return self.scheduler.write(
+            worksheet, lambda: sheets.update_cell_if_empty(self.conn, worksheet, key_col, key, col, value))
+
+    def io_stats(self):
+        return self.scheduler.stats()
+
+
+# ------------------------------------------------------------------------------
+# SQLITE (WAL, CONNEXIONS MUTUALISÉES)
+# ------------------------------------------------------------------------------
+class SQLiteStorage(Storage):
+    """Lectures sur un pool borné de connexions en lecture seule (WAL : elles ne bloquent pas
+    l'écrivain) ; écritures sur une connexion dédiée, les `append` concurrents étant regroupés
+    dans une même transaction (commit de groupe)."""
+
+    def __init__(self, path, pool_size=8):
+        self.path = path
+        self._pool = queue.LifoQueue()
+        self._pool_size = pool_size
+        self._created = 0
+        self._guard = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._pending = collections.deque()  # [feuille, lignes, terminé, erreur]
+        self._stats = collections.Counter()
+        # Requêtes préparées une fois ; sqlite3 garde leur compilation (cached_statements)
+        self._sql = {ws: {
+            "select": f"SELECT {', '.join(cols)} FROM {ws} ORDER BY rowid",
+            "since": f"SELECT {', '.join(cols)} FROM {ws} ORDER BY rowid LIMIT -1 OFFSET ?",
+            "insert": f"INSERT INTO {ws} VALUES ({', '.join('?' * len(cols))})",
+        } for ws, cols in SCHEMA.items()}
+        self._writer = self._connect()
+        self._writer.execute("PRAGMA journal_mode=WAL")
+        for table, cols in SCHEMA.items():
+            self._writer.execute(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(f'{col} TEXT' for col in cols)})")
+        for ddl in INDEXES:
+            self._writer.execute(ddl)
+
+    def _connect(self, readonly=False):
+        c = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None,
+                            cached_statements=256)
+        c.execute("PRAGMA synchronous=NORMAL")
+        c.execute("PRAGMA busy_timeout=30000")
+        if readonly:
+            c.execute("PRAGMA query_only=ON")
+        return c
+
+    @contextlib.contextmanager
+    def _conn(self):
+        t0 = time.perf_counter()
+        try:
+            c = self._pool.get_nowait()
+        except queue.Empty:
+            with self._guard:
+                create = self._created < self._pool_size
+                if create:
+                    self._created += 1
+            if create:
+                c = self._connect(readonly=True)
+            else:
+                c = self._pool.get()
+        wait_ms = (time.perf_counter() - t0) * 1000
+        with self._guard:
+            self._stats["pool_acquisitions"] += 1
+            self._stats["pool_waits"] += wait_ms > 1
+        tracing.record("storage.sqlite.pool_wait", wait_ms)
+        try:
+            yield c
+        finally:
+            self._pool.put(c)
+
+    @contextlib.contextmanager
+    def _write(self):
+        with self._write_lock:
+            with self._writer:
+                self._writer.execute("BEGIN IMMEDIATE")
+                yield self._writer
+
+    @staticmethod
+    def _check(worksheet, *cols):
+        if worksheet not in SCHEMA or any(c not in SCHEMA[worksheet] for c in cols):
+            raise KeyError(f"{worksheet}: {cols}")
+
+    def read(self, worksheet):
+        self._check(worksheet)
+        with self._conn() as c:
+            return pd.read_sql_query(self._sql[worksheet]["select"], c)
+
+    def read_since(self, worksheet, start):
+        self._check(worksheet)
+        with self._conn() as c:
+            return pd.read_sql_query(self._sql[worksheet]["since"], c, params=(int(start),))
+
+    def get_row(self, worksheet, key_col, key):
+        self._check(worksheet, key_col)
+        cols = SCHEMA[worksheet]
+        with self._conn() as c:
+            row = c.execute(f"SELECT {', '.join(cols)} FROM {worksheet} WHERE {key_col} = ? LIMIT 1",
+                            (str(key).strip(),)).fetchone()
+        return dict(zip(cols, row)) if row else None
+
+    def append(self, worksheet, rows):
+        self._check(worksheet)
+        cols = SCHEMA[worksheet]
+        rows = [[None if _is_empty(v) else str(v) for v in r] + [None] * (len(cols) - len(r)) for r in rows]
+        job = [worksheet, rows, threading.Event(), None]
+        self._pending.append(job)
+        with self._write_lock:
+            # Le premier arrivé écrit tout ce qui attend ; les autres trouvent leur lot déjà validé
+            if not job[2].is_set():
+                batch = []
+                while self._pending:
+                    batch.append(self._pending.popleft())
+                try:
+                    with self._writer:
+                        self._writer.execute("BEGIN IMMEDIATE")
+                        for ws, ws_rows, _, _ in batch:
+                            self._writer.executemany(self._sql[ws]["insert"], ws_rows)
+                    self._stats["commits"] += 1
+                    self._stats["batched_appends"] += len(batch)
+                except Exception as e:
+                    for j in batch:
+                        j[3] = e
+                finally:
+                    for j in batch:
+                        j[2].set()
+        if job[3] is not None:
+            raise job[3]
+
+    def update_cell_if_empty(self, worksheet, key_col, key, col, value):
+        # Atomique : la condition "encore vide" est évaluée par SQLite dans l'UPDATE
+        self._check(worksheet, key_col, col)
+        key = str(key).strip()
+        with self._write() as c:
+            c.execute(f"UPDATE {worksheet} SET {col} = ? WHERE {key_col} = ? AND ({col} IS NULL OR TRIM({col}) = '')",
+                      (value, key))
+            row = c.execute(f"SELECT {col} FROM {worksheet} WHERE {key_col} = ? LIMIT 1", (key,)).fetchone()
+        return None if row is None or _is_empty(row[0]) else str(row[0]).strip()
+
+    def replace(self, worksheet, df):
+        """Remplace le contenu d'une table (import depuis la feuille Google)."""
+        self._check(worksheet)
+        cols = SCHEMA[worksheet]
+        df = df.reindex(columns=cols)
+        rows = [[None if _is_empty(v) else str(v) for v in r] for r in df.itertuples(index=False)]
+        with self._write() as c:
+            c.execute(f"DELETE FROM {worksheet}")
+            c.executemany(self._sql[worksheet]["insert"], rows)
+
+    def stats(self):
+        return dict(self._stats, pool_size=self._created)
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._write_lock:
+            self._writer.close()
+
+
+# ------------------------------------------------------------------------------
+# SQLITE + MIROIR GOOGLE SHEETS
+# ------------------------------------------------------------------------------
+class MirroredStorage(Storage):
+    """Sert tout depuis SQLite et recopie les ajouts vers la feuille en tâche de fond
+    (le verrou `update_cell_if_empty`, lui, est posé d'abord sur la feuille).
+
+    Les feuilles de `pull` (par défaut `users`, administrée à la main dans Google Sheets)
+    sont relues depuis la feuille à chaque `read` puis recopiées en local ; en cas
+    d'échec réseau, la copie locale est servie.
+    """
+
+    def __init__(self, primary, mirror, pull=("users",)):
+        self.primary = primary
+        self.mirror = mirror
+        self.pull = set(pull)
+        self._writers = {ws: LogWriter(lambda rows, ws=ws: mirror.append(ws, rows)) for ws in SCHEMA}
+
+    def read(self, worksheet):
+        if worksheet in self.pull:
+            try:
+                df = self.mirror.read(worksheet)
+                self.primary.replace(worksheet, df)
+                return df
+            except Exception:
+                pass
+        return self.primary.read(worksheet)
+
+    def read_since(self, worksheet, start):
+        if worksheet in self.pull:
+            return self.read(worksheet).iloc[start:].reset_index(drop=True)
+        return self.primary.read_since(worksheet, start)
+
+    def get_row(self, worksheet, key_col, key):
+        return self.primary.get_row(worksheet, key_col, key)
+
+    def append(self, worksheet, rows):
+        self.primary.append(worksheet, rows)
+        for r in rows:
+            self._writers[worksheet].submit(r)
+
+    def update_cell_if_empty(self, worksheet, key_col, key, col, value):
+        # La feuille fait foi (verrou machine partagé entre serveurs, et `read` des feuilles
+        # de `pull` écrase la copie locale) : comparaison-écriture sur la feuille d'abord,
+        # synchrone (retentes 429 de l'ordonnanceur) ; une erreur remonte à l'appelant.
+        result = self.mirror.update_cell_if_empty(worksheet, key_col, key, col, value)
+        if result is not None:
+            self.primary.update_cell_if_empty(worksheet, key_col, key, col, result)
+        return result
+
+    def io_stats(self):
+        return self.mirror.io_stats()
+
+    def stats(self):
+        return self.primary.stats()
+
+    def close(self):
+        for w in self._writers.values():
+            w.close()
+        self.primary.close()
+
+
+class TracedStorage(Storage):
+    """Enveloppe chaque appel dans un span `storage.<backend>.<opération>.<feuille>`."""
+
+    def __init__(self, inner, label):
+        self.inner = inner
+        self.label = label
+
+    def _call(self, op, worksheet, *args):
+        with tracing.span(f"storage.{self.label}.{op}.{worksheet}"):
+            return getattr(self.inner, op)(worksheet, *args)
+
+    def read(self, worksheet):
+        return self._call("read", worksheet)
+
+    def read_since(self, worksheet, start):
+        return self._call("read_since", worksheet, start)
+
+    def get_row(self, worksheet, key_col, key):
+        return self._call("get_row", worksheet, key_col, key)
+
+    def append(self, worksheet, rows):
+        return self._call("append", worksheet, rows)
+
+    def update_cell_if_empty(self, worksheet, key_col, key, col, value):
+        return self._call("update_cell_if_empty", worksheet, key_col, key, col, value)
+
+    def replace(self, worksheet, df):
+        return self._call("replace", worksheet, df)
+
+    def io_stats(self):
+        return self.inner.io_stats()
+
+    def stats(self):
+        return self.inner.stats()
+
+    def close(self):
+        self.inner.close()
+
+
+class SharedCacheStorage(Storage):
+    """Instantanés des feuilles `worksheets` partagés entre processus (voir shared_cache.py) :
+    une lecture Google par version pour tout le groupe de serveurs. Chaque écriture, d'où
+    qu'elle vienne, publie une nouvelle version de la feuille."""
+
+    def __init__(self, inner, cache, worksheets=("users",), ttls=None):
+        self.inner = inner
+        self.cache = cache
+        self.worksheets = set(worksheets)
+        self.ttls = SNAPSHOT_TTL if ttls is None else ttls
+
+    def _snapshot(self, worksheet, copy=True):
+        ttl = min(self.cache.ttl, self.ttls.get(worksheet, self.cache.ttl))
+        return self.cache.get(f"sheet:{worksheet}", lambda: self.inner.read(worksheet), ttl=ttl, copy=copy)
+
+    def read(self, worksheet):
+        if worksheet not in self.worksheets:
+            return self.inner.read(worksheet)
+        return self._snapshot(worksheet)
+
+    def read_since(self, worksheet, start):
+        if worksheet not in self.worksheets:
+            return self.inner.read_since(worksheet, start)
+        # Seule la fin de l'instantané est copiée
+        return self._snapshot(worksheet, copy=False).iloc[start:].reset_index(drop=True).copy()
+
+    def version(self, worksheet):
+        return self.cache.version(f"sheet:{worksheet}") if worksheet in self.worksheets else None
+
+    def _written(self, worksheet):
+        if worksheet in self.worksheets:
+            self.cache.bump(f"sheet:{worksheet}")
+
+    def get_row(self, worksheet, key_col, key):
+        return self.inner.get_row(worksheet, key_col, key)
+
+    def append(self, worksheet, rows):
+        try:
+            return self.inner.append(worksheet, rows)
+        finally:
+            self._written(worksheet)
+
+    def update_cell_if_empty(self, worksheet, key_col, key, col, value):
+        try:
+            return self.inner.update_cell_if_empty(worksheet, key_col, key, col, value)
+        finally:
+            self._written(worksheet)
+
+    def replace(self, worksheet, df):
+        try:
+            return self.inner.replace(worksheet, df)
+        finally:
+            self._written(worksheet)
+
+    def io_stats(self):
+        return self.inner.io_stats()
+
+    def stats(self):
+        return dict(self.inner.stats(), shared_cache=self.cache.stats())
+
+    def close(self):
+        self.inner.close()
+
+
+def from_config(config, conn_factory):
+    """Construit le stockage décrit par la section [storage] des secrets.
+
+    backend = "gsheets" (défaut) | "sqlite" ; path = fichier SQLite ; mirror = true pour
+    recopier vers Google Sheets. `conn_factory()` retourne la connexion GSheets.
+    read_quota / write_quota = requêtes Google par minute (60 par défaut).
+    shared_cache = "file" | "redis" pour partager les feuilles `shared_cache_worksheets`
+    (["users"] par défaut) entre plusieurs processus (voir shared_cache.from_config) ;
+    shared_cache_ttls = {feuille: secondes} complète SNAPSHOT_TTL. `guestbook` n'y gagne
+    rien : chaque signature relirait toute la feuille, le mur lit déjà par read_since.
+    """
+    store = _backend(config, conn_factory)
+    cache = shared_cache.from_config(config)
+    if cache is None:
+        return store
+    return SharedCacheStorage(store, cache, config.get("shared_cache_worksheets", ["users"]),
+                              {**SNAPSHOT_TTL, **config.get("shared_cache_ttls", {})})
+
+
+def _backend(config, conn_factory):
+    backend = config.get("backend", "gsheets")
+    scheduler = IOScheduler(write_quota=int(config.get("write_quota", 60)),
+                            read_quota=int(config.get("read_quota", 60)))
+    if backend == "gsheets":
+        return TracedStorage(SheetsStorage(conn_factory(), scheduler), "gsheets")
+    if backend == "sqlite":
+        local = TracedStorage(SQLiteStorage(config.get("path", "gen_control.db"),
+                                            pool_size=int(config.get("pool_size", 8))), "sqlite")
+        if config.get("mirror", False):
+            mirror = TracedStorage(SheetsStorage(conn_factory(), scheduler), "gsheets")
+            return MirroredStorage(local, mirror, pull=config.get("pull", ["users"]))
+        return local
+    raise ValueError(f"Backend de stockage inconnu : {backend}")
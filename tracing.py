@@ -0,0 +1,113 @@
+# ==============================================================================
+# GEN-CONTROL - INSTRUMENTATION (SPANS CHRONOMÉTRÉS)
+# Agrégats en mémoire par nom (nombre, erreurs, p50/p95/p99) + fichier JSON-lines optionnel.
+# ==============================================================================
+import collections
+import contextlib
+import functools
+import json
+import random
+import threading
+import time
+
+from log_writer import LogWriter
+
+RESERVOIR = 1024  # dernières durées conservées par span pour les percentiles
+SINK_FIELDS = ("ts", "span", "ms", "error")  # une ligne JSON par span mesuré
+
+_state = {"sample_rate": 1.0, "sink": None}
+_spans = {}
+_lock = threading.Lock()
+
+
+class _Stats:
+    __slots__ = ("count", "errors", "total_ms", "max_ms", "durations")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.durations = collections.deque(maxlen=RESERVOIR)
+
+
+def configure(sample_rate=1.0, sink=None, **kwargs):
+    """`sample_rate` : fraction des spans mesurés (0 = instrumentation coupée).
+    `sink` : chemin d'un fichier JSON-lines recevant chaque span mesuré."""
+    _state["sample_rate"] = float(sample_rate)
+    if _state["sink"] is not None:
+        _state["sink"].close()
+    _state["sink"] = None
+    if sink:
+        def write(rows, path=sink):
+            # LogWriter transporte des listes : l'objet JSON est reconstruit ici
+            with open(path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(dict(zip(SINK_FIELDS, r)), ensure_ascii=False) + "\n" for r in rows)
+        _state["sink"] = LogWriter(write, batch_size=200, flush_interval=5.0)
+
+
+def record(name, ms, error=False):
+    if _state["sample_rate"] <= 0:
+        return
+    with _lock:
+        s = _spans.get(name)
+        if s is None:
+            s = _spans[name] = _Stats()
+        s.count += 1
+        s.errors += bool(error)
+        s.total_ms += ms
+        s.max_ms = max(s.max_ms, ms)
+        s.durations.append(ms)
+    if _state["sink"] is not None:
+        _state["sink"].submit([time.time(), name, round(ms, 3), bool(error)])
+
+
+@contextlib.contextmanager
+def span(name):
+    """Chronomètre le bloc ; une exception qui le traverse est comptée comme erreur."""
+    rate = _state["sample_rate"]
+    if rate <= 0 or (rate < 1 and random.random() >= rate):
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        # Les exceptions de contrôle Streamlit (st.rerun, st.stop) ne sont pas des erreurs
+        record(name, (time.perf_counter() - t0) * 1000, error=isinstance(e, Exception))
+        raise
+    record(name, (time.perf_counter() - t0) * 1000)
+
+
+def traced(name):
+    """Décorateur : chaque appel de la fonction est un span `name`."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def snapshot():
+    """Une ligne par span, triée par temps total décroissant."""
+    with _lock:
+        items = [(name, s.count, s.errors, s.total_ms, s.max_ms, sorted(s.durations)) for name, s in _spans.items()]
+    rows = [{
+        "span": name, "count": count, "errors": errors,
+        "p50_ms": _percentile(d, 0.50), "p95_ms": _percentile(d, 0.95), "p99_ms": _percentile(d, 0.99),
+        "max_ms": max_ms, "total_ms": total,
+    } for name, count, errors, total, max_ms, d in items]
+    return sorted(rows, key=lambda r: r["total_ms"], reverse=True)
+
+
+def reset():
+    with _lock:
+        _spans.clear()
@@ -0,0 +1,134 @@
+# ==============================================================================
+# GEN-CONTROL - STATISTIQUES D'UTILISATION (AGRÉGATS INCRÉMENTAUX DE `logs`)
+# Compteurs par (code, jour, action) mis à jour avec les seules nouvelles lignes
+# du journal ; instantané Parquet pour repartir sans relire l'historique.
+# ==============================================================================
+import os
+import threading
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import willans
+
+KEYS = ["code", "jour", "action"]
+MEASURES = ["n", "audits", "surconso", "sousconso", "perte", "ecart_sum"]
+FORMAT = "1"
+
+# Détails écrits par log_action (gen_control.py)
+_CALCUL = r"^\s*(-?[\d.]+)% \| (-?\d+)F"
+_FLOTTE = r"^\s*(\d+) lignes \| (\d+) anomalies \| (-?\d+)F"
+
+
+def aggregate(logs):
+    """Agrège un lot de lignes `logs` : une ligne par (code, jour, action), colonnes MEASURES."""
+    if logs.empty:
+        return pd.DataFrame(columns=KEYS + MEASURES)
+    details = logs["details"].fillna("").astype(str)
+    action = logs["action"].fillna("").astype(str).str.strip()
+    df = pd.DataFrame({
+        "code": logs["code_utilise"].fillna("").astype(str).str.strip(),
+        "jour": logs["date_heure"].fillna("").astype(str).str[:10],
+        "action": action,
+        "n": 1,
+    })
+    # Chaque motif n'est appliqué qu'aux lignes de son action
+    calcul = details[action == "CALCUL"].str.extract(_CALCUL).astype(float).reindex(details.index)
+    flotte = details[action == "FLOTTE"].str.extract(_FLOTTE).astype(float).reindex(details.index)
+    is_calcul = (action == "CALCUL") & calcul[0].notna()
+    is_flotte = (action == "FLOTTE") & flotte[0].notna()
+    pct = calcul[0].where(is_calcul, 0.0)
+    seuil = willans.SEUIL * 100
+    df["audits"] = is_calcul.astype(int) + flotte[0].where(is_flotte, 0).astype(int)
+    df["surconso"] = (is_calcul & (pct > seuil)).astype(int) + flotte[1].where(is_flotte, 0).astype(int)
+    df["sousconso"] = (is_calcul & (pct < -seuil)).astype(int)
+    # Pertes détectées = surconsommations seulement (l'audit de flotte ne journalise que celles-là)
+    df["perte"] = calcul[1].where(is_calcul & (pct > seuil), 0.0) + flotte[2].where(is_flotte, 0.0)
+    df["ecart_sum"] = pct
+    return df.groupby(KEYS, as_index=False, sort=False)[MEASURES].sum()
+
+
+class UsageAggregates:
+    """Agrégats partagés entre sessions. `refresh()` lit le journal à partir du dernier
+    rang consommé (au plus toutes les `min_interval` s) ; l'instantané `path` est réécrit
+    au plus toutes les `snapshot_interval` s."""
+
+    def __init__(self, store, path=None, worksheet="logs", min_interval=30.0, snapshot_interval=300.0):
+        self.store = store
+        self.path = path
+        self.worksheet = worksheet
+        self.min_interval = min_interval
+        self.snapshot_interval = snapshot_interval
+        self.position = 0   # lignes du journal déjà agrégées
+        self._cells = {}    # (code, jour, action) -> [mesures]
+        self._frame = None
+        self._checked_at = 0.0
+        self._saved_at = time.monotonic()
+        self._dirty = False
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        try:
+            table = pq.read_table(self.path)
+            meta = table.schema.metadata or {}
+            if meta.get(b"format") != FORMAT.encode():
+                return
+            for r in table.to_pandas().itertuples(index=False):
+                self._cells[(r.code, r.jour, r.action)] = [getattr(r, m) for m in MEASURES]
+            self.position = int(meta[b"position"])
+        except Exception:
+            self._cells.clear()
+            self.position = 0
+
+    def ingest(self, logs):
+        """Ajoute un lot de nouvelles lignes du journal (coût proportionnel au lot)."""
+        for r in aggregate(logs).itertuples(index=False):
+            cell = self._cells.get((r.code, r.jour, r.action))
+            values = [getattr(r, m) for m in MEASURES]
+            if cell is None:
+                self._cells[(r.code, r.jour, r.action)] = values
+            else:
+                for i, v in enumerate(values):
+                    cell[i] += v
+        self._frame = None
+        self._dirty = True
+
+    def refresh(self, force=False):
+        """Agrège les lignes ajoutées au journal ; retourne leur nombre."""
+        with self._lock:
+            if not force and time.monotonic() - self._checked_at < self.min_interval:
+                return 0
+            new = self.store.read_since(self.worksheet, self.position)
+            self._checked_at = time.monotonic()
+            if len(new):
+                self.ingest(new)
+                self.position += len(new)
+            if self._dirty and self.path and (force or time.monotonic() - self._saved_at >= self.snapshot_interval):
+                self._save()
+            return len(new)
+
+    def frame(self):
+        """Agrégats courants (DataFrame, une ligne par code / jour / action)."""
+        with self._lock:
+            if self._frame is None:
+                self._frame = pd.DataFrame([list(k) + v for k, v in self._cells.items()], columns=KEYS + MEASURES)
+            return self._frame
+
+    def _save(self):
+        df = pd.DataFrame([list(k) + v for k, v in self._cells.items()], columns=KEYS + MEASURES)
+        table = pa.Table.from_pandas(df, preserve_index=False).replace_schema_metadata(
+            {"format": FORMAT, "position": str(self.position)})
+        tmp = f"{self.path}.tmp"
+        pq.write_table(table, tmp, compression="zstd")
+        os.replace(tmp, self.path)
+        self._saved_at = time.monotonic()
+        self._dirty = False
+
+    def save(self):
+        with self._lock:
+            if self.path:
+                self._save()
@@ -0,0 +1,78 @@
+# ==============================================================================
+# LIVRE D'OR - MUR DES MESSAGES INCRÉMENTAL
+# Instantané partagé + high-water mark : seules les nouvelles lignes sont lues et rendues.
+# ==============================================================================
+import html
+import threading
+import time
+
+import pandas as pd
+
+from search_index import SearchIndex
+
+CARD_TEMPLATE = """
+<div class="message-card">
+    <div class="author">{nom} <span style="color:#FF6600;">{promo}</span></div>
+    <div class="meta">🏢 {entreprise} • 🕒 {date}</div>
+    <div class="msg-text">“ {message} ”</div>
+</div>
+"""
+
+
+def _txt(value):
+    return "" if value is None or pd.isna(value) else html.escape(str(value))
+
+
+def render_card(row):
+    promo = _txt(row.get("promo"))
+    return CARD_TEMPLATE.format(
+        nom=_txt(row.get("nom")),
+        promo=f" | Promo {promo}" if promo else "",
+        entreprise=_txt(row.get("entreprise")),
+        date=_txt(row.get("date")),
+        message=_txt(row.get("message")),
+    )
+
+
+class MessageWall:
+    """Mur partagé entre sessions. `refresh()` ne lit que les lignes ajoutées depuis le
+    dernier appel (au plus une lecture toutes les `min_interval` secondes)."""
+
+    def __init__(self, store, worksheet="guestbook", min_interval=2.0):
+        self.store = store
+        self.worksheet = worksheet
+        self.min_interval = min_interval
+        self.rows = []
+        self.cards = []   # HTML mémorisé, même ordre que self.rows
+        self.index = SearchIndex()  # rang dans l'index = rang dans self.rows
+        self._position = 0  # high-water mark : lignes de la feuille déjà lues
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def refresh(self, force=False):
+        """Ajoute les nouvelles lignes ; retourne leur nombre."""
+        with self._lock:
+            if not force and time.monotonic() - self._checked_at < self.min_interval:
+                return 0
+            new = self.store.read_since(self.worksheet, self._position)
+            self._checked_at = time.monotonic()
+            self._position += len(new)
+            records = [r for r in new.to_dict("records") if any(_txt(v) != "" for v in r.values())]
+            self.rows.extend(records)
+            self.cards.extend(render_card(r) for r in records)
+            for r in records:
+                self.index.add(r)
+            return len(records)
+
+    def page(self, count, start=0):
+        """Cartes du plus récent au plus ancien : `count` cartes à partir du rang `start`."""
+        end = len(self.cards) - start
+        return self.cards[max(end - count, 0):max(end, 0)][::-1]
+
+    def search(self, query="", filters=None, count=None):
+        """Recherche (voir SearchIndex.search) : (cartes du plus récent au plus ancien, rangs trouvés)."""
+        docs = self.index.search(query, filters)
+        return [self.cards[d] for d in docs[:count]], docs
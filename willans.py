@@ -0,0 +1,96 @@
+# ==============================================================================
+# GEN-CONTROL - MOTEUR WILLANS VECTORISÉ
+# Même formule que l'audit unitaire, appliquée à des lots entiers (NumPy).
+# ==============================================================================
+import numpy as np
+import pandas as pd
+
+CSP = 0.24            # Consommation spécifique (L/kWh)
+FRICTION = 0.08       # Friction à vide = 8%
+PENTE = 0.92          # Part proportionnelle à la charge
+SEUIL = 0.10          # Tolérance du verdict (±10%)
+PRIX_DEFAUT = 828     # FCFA / L
+
+SURCONSO, COHERENT, SOUSCONSO = 1, 0, -1
+VERDICTS = {
+    SURCONSO: ("ANOMALIE : SURCONSOMMATION", "#FF4B4B", "🚨"),
+    SOUSCONSO: ("SOUS-CONSOMMATION (Check données)", "#FFA500", "⚠️"),
+    COHERENT: ("COHÉRENT (RAS)", "#00C853", "✅"),
+}
+
+# Colonnes attendues pour un audit de flotte (prix et csp optionnels)
+COLONNES = ["puissance_kw", "facteur_charge", "heures", "litres"]
+
+
+def conso_horaire(puissance_kw, facteur_charge, csp=CSP, friction=FRICTION):
+    """Consommation théorique (L/h) : P_nom * CSP * (Friction + 0.92 * Charge)."""
+    return puissance_kw * csp * (friction + (PENTE * facteur_charge))
+
+
+def audit(puissance_kw, facteur_charge, heures, litres, prix=PRIX_DEFAUT, csp=CSP, seuil=SEUIL, friction=FRICTION):
+    """Audit d'un lot : scalaires ou tableaux (diffusion NumPy). Retourne un dict de tableaux
+    `theo`, `ecart`, `pct`, `perte`, `verdict` (1 = surconso, 0 = cohérent, -1 = sous-conso)."""
+    p = np.asarray(puissance_kw, dtype=np.float64)
+    fc = np.asarray(facteur_charge, dtype=np.float64)
+    h = np.asarray(heures, dtype=np.float64)
+    l = np.asarray(litres, dtype=np.float64)
+
+    theo = conso_horaire(p, fc, np.asarray(csp, dtype=np.float64), np.asarray(friction, dtype=np.float64)) * h
+    ecart = l - theo
+    pct = np.divide(ecart * 100, theo, out=np.zeros(np.broadcast(ecart, theo).shape), where=theo > 0)
+    perte = ecart * np.asarray(prix, dtype=np.float64)
+
+    tol = theo * seuil
+    verdict = np.where(ecart > tol, SURCONSO, np.where(ecart < -tol, SOUSCONSO, COHERENT)).astype(np.int8)
+    return {"theo": theo, "ecart": ecart, "pct": pct, "perte": perte, "verdict": verdict}
+
+
+def audit_dataframe(df, prix=PRIX_DEFAUT, csp=CSP, seuil=SEUIL, friction=FRICTION):
+    """Ajoute les colonnes d'audit à une copie de `df` (colonnes COLONNES, `prix`/`csp`/`friction` optionnelles)."""
+    manquantes = [c for c in COLONNES if c not in df.columns]
+    if manquantes:
+        raise ValueError(f"Colonnes manquantes : {', '.join(manquantes)}")
+    res = audit(
+        df["puissance_kw"].to_numpy(dtype=np.float64),
+        df["facteur_charge"].to_numpy(dtype=np.float64),
+        df["heures"].to_numpy(dtype=np.float64),
+        df["litres"].to_numpy(dtype=np.float64),
+        prix=df["prix"].to_numpy(dtype=np.float64) if "prix" in df.columns else prix,
+        csp=df["csp"].to_numpy(dtype=np.float64) if "csp" in df.columns else csp,
+        seuil=seuil,
+        friction=df["friction"].to_numpy(dtype=np.float64) if "friction" in df.columns else friction,
+    )
+    out = df.copy()
+    out["theo_l"] = res["theo"]
+    out["ecart_l"] = res["ecart"]
+    out["ecart_pct"] = res["pct"]
+    out["perte_fcfa"] = res["perte"]
+    out["verdict"] = pd.Categorical.from_codes(res["verdict"] + 1, ["SOUS-CONSO", "COHERENT", "SURCONSO"])
+    return out
+
+
+# Mode confiance : tirages Monte Carlo sur les entrées incertaines d'un audit unitaire
+MC_TIRAGES = 100_000
+MC_NIVEAU = 0.90
+
+
+def monte_carlo(puissance_kw, facteur_charge, heures, litres, csp=CSP, friction=FRICTION, seuil=SEUIL,
+                sigma_charge=0.20, sigma_csp=0.08, sigma_heures=0.05, n=MC_TIRAGES, niveau=MC_NIVEAU, seed=None):
+    """Charge, CSP et heures tirées selon des lois normales d'écart-type relatif `sigma_*`
+    (tronquées aux valeurs physiques). Retourne l'intervalle `niveau` de la conso théorique,
+    P(déclaré > théorique) et P(déclaré > théorique + seuil)."""
+    rng = np.random.default_rng(seed)
+    z = rng.standard_normal((3, n), dtype=np.float32)
+    fc = np.clip(facteur_charge * (1 + sigma_charge * z[0]), 0.0, 1.1)
+    c = np.maximum(csp * (1 + sigma_csp * z[1]), 0.0)
+    h = np.maximum(heures * (1 + sigma_heures * z[2]), 0.0)
+    theo = conso_horaire(puissance_kw, fc, c, friction) * h
+
+    a = (1 - niveau) / 2
+    bas, median, haut = np.quantile(theo, [a, 0.5, 1 - a])
+    return {
+        "theo_bas": float(bas), "theo_median": float(median), "theo_haut": float(haut), "niveau": niveau,
+        "p_surconso": float(np.count_nonzero(theo < litres)) / n,
+        "p_anomalie": float(np.count_nonzero(theo * (1 + seuil) < litres)) / n,
+        "tirages": n,
+    }